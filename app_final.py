@@ -4,13 +4,55 @@ import io
 import os
 import json
 from google import genai
-from google.genai import types
-import openpyxl
-from io import BytesIO # Import BytesIO for memory handling
 import time
 import hashlib
-import re
 import html  # Diperlukan untuk html.escape()
+import uuid
+from insight_cache import InsightCache, hash_text
+from gemini_scheduler import GeminiCallScheduler, SchedulerBusyError
+from insight_manifest import CHANGE_LABELS, CHANGE_UNCHANGED, InsightManifest
+from insight_metrics import InsightMetrics, RunTrace
+from insight_parser import StreamingInsightParser, parse_ai_response
+from insight_pipeline import (
+    BATCH_DEFAULT_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    CROSS_PROGRAM_SHEET_NAME,
+    CSV_DIVISION_COLUMNS,
+    CROSS_SUMMARY_SHEET_NAME,
+    GEMINI_MODEL_NAME,
+    MISSING_DEFINITION_TEXT,
+    OUTPUT_MODE_JSON,
+    OUTPUT_MODE_TEXT,
+    PROGRAM_DUPLICATE_THRESHOLD,
+    PROGRAM_INDEX_COLUMNS,
+    build_batch_comparison_df,
+    build_comparison_df,
+    build_csv_cluster_index,
+    build_csv_program_index,
+    build_revision_diff_df,
+    build_workbook_cluster_index,
+    collect_cluster_jobs,
+    compare_workbooks,
+    create_gemini_scheduler,
+    create_insight_cache,
+    create_insight_manifest,
+    create_insight_metrics,
+    division_key,
+    find_csv_column,
+    build_workbook_program_index,
+    get_existing_programs,
+    insight_cache_key,
+    match_ai_programs,
+    prompt_budget,
+    read_csv_columns,
+    read_workbook_sheets,
+    run_incremental_insights,
+    run_insight_batch,
+    scheduled_strategic_insight,
+    scheduled_strategic_insight_stream,
+    to_excel,
+    to_excel_sheets,
+)
 
 
 # --- 1. CONFIGURATION AND INITIALIZATION ---
@@ -35,126 +77,640 @@ except Exception as e:
     st.stop()
 
 
+
+# --- Cache insight & scheduler Gemini bersama (lihat insight_pipeline.py untuk konfigurasinya) ---
+@st.cache_resource
+def get_insight_cache() -> InsightCache:
+    """
+    Satu instance cache insight per proses server, dibagikan ke semua sesi.
+    """
+    return create_insight_cache()
+
+
+@st.cache_resource
+def get_insight_manifest() -> InsightManifest:
+    """
+    Manifest fingerprint cluster untuk mode batch inkremental (satu per proses server).
+    """
+    return create_insight_manifest()
+
+
+@st.cache_resource
+def get_gemini_scheduler() -> GeminiCallScheduler:
+    """
+    Satu scheduler per proses server, dibagikan ke semua sesi.
+    """
+    return create_gemini_scheduler()
+
+
+@st.cache_resource
+def get_insight_metrics() -> InsightMetrics:
+    """
+    Satu penampung metrik per proses server (panel diagnostik + file JSONL).
+    """
+    return create_insight_metrics()
+
+
 # --- 3. Logic : CALL GEMINI (Fungsi 1 - MODE TEKS) ---
-# (Fungsi ini tidak berubah)
-def get_gemini_strategic_insight(divisi: str, cluster: str, cluster_definition: str, model_name: str) -> str:
+# Prompt, cache key, dan panggilan Gemini ada di insight_pipeline.py (dipakai juga oleh CLI).
+
+
+def get_gemini_strategic_insight(divisi: str, cluster: str, cluster_definition: str, model_name: str, output_mode: str = OUTPUT_MODE_TEXT, trace: RunTrace = None) -> str:
     """
-    PANGGILAN API #1:
-    Melakukan panggilan API ke Gemini dalam MODE TEKS untuk menghasilkan daftar insight strategis.
+    Versi UI dari `request_strategic_insight`: error ditampilkan lewat `st.error`.
     
     Returns:
         (str): Hasil teks mentah (atau None jika error).
     """
-    
-    # (PROMPT DARI PERCAKAPAN SEBELUMNYA SUDAH BENAR)
-    system_prompt = f"""
-    Anda adalah AI yang bertugas membuat daftar program kerja (job programs) dan deskripsi yang relevan untuk Divisi '{divisi}' dengan Cluster '{cluster}' menurut insight anda sendiri yang dicari dari internet dan menentukan apakah
-    itu termasuk dalam OKR tipe Objectives (Objectives (tujuan): Apa yang ingin dicapai? Objectives harus jelas, ringkas, dan inspiratif) atau Key Results(Key Results (hasil kunci): Bagaimana cara mencapai tujuan tersebut? Key results adalah indikator terukur yang menunjukkan seberapa dekat kita dengan pencapaian objective).
-
-    DEFINISI CLUSTER SAAT INI (KONTEKS):
-    '{cluster_definition}'
-
-    INSTRUKSI SANGAT KETAT (HARUS DIIKUTI):
-    1.  Output WAJIB dalam bahasa Indonesia.
-    2.  Buat beberapa program kerja baru yang relevan dengan cluster ini, FOKUS pada tren industri ritel modern.
-    3.  JANGAN PERNAH menulis paragraf pembuka, sapaan, atau penjelasan (Contoh: "Sebagai seorang ahli...", "Berikut adalah...", dsb.).
-    4.  JANGAN PERNAH menulis kesimpulan atau ringkasan di bagian akhir.
-    5.  Output Anda HARUS dan HANYA BOLEH berisi daftar berpoin (bullet points), dimulai dengan tanda `-` atau `*`.
-    6.  Setiap poin WAJIB mengikuti format `Program:`, `Deskripsi:`, dan `OKR:` persis seperti contoh di bawah.
-    7.  Di bagian PALING AKHIR, setelah semua daftar program, tambahkan bagian `Sumber:` dan berikan beberapa sitasi terpercaya (situs resmi seperti Amazon dll., jurnal pendidikan, laporan industri) dengan link yang bisa diakses. JANGAN gunakan blog pribadi.
-
-    BENTUK OUTPUT (WAJIB DIIKUTI PERSIS):
-
-    - Program: [Nama Program Kerja 1 Sesuai Tren]
-      Deskripsi: [Deskripsi singkat untuk program 1 yang relevan dengan tren]
-      OKR : [Tentukan apakah program ini termasuk Objectives atau Key Results. JAWAB HANYA DENGAN `Objectives` atau `Key Results`]
-
-    - Program: [Nama Program Kerja 2 Sesuai Tren]
-      Deskripsi: [Deskripsi singkat untuk program 2 yang relevan dengan tren]
-      OKR : [Tentukan apakah program ini termasuk Objectives atau Key Results. JAWAB HANYA DENGAN `Objectives` atau `Key Results`]
-
-    - Program: [Nama Program Kerja 3 Sesuai Tren]
-      Deskripsi: [Deskripsi singkat untuk program 3 yang relevan dengan tren]
-      OKR : [Tentukan apakah program ini termasuk Objectives atau Key Results. JAWAB HANYA DENGAN `Objectives` atau `Key Results`]
-
-    Sumber:
-    - [Nama Jurnal/Laporan/Situs Resmi] - Judul - https://contoh.url/
-    - [Nama Jurnal/Laporan/Situs Resmi] - Judul - https://contoh.url/
-    """
-    
-    config = types.GenerateContentConfig(
-        system_instruction=system_prompt
-    )
-    
-    user_prompt = f"Berikan insight AI untuk Divisi: {divisi}, Cluster: {cluster}"
-
     try:
-        response = client.models.generate_content(
-            model=model_name,
-            contents=user_prompt,
-            config=config 
-        )
-
-        result = getattr(response, "text", None)
-        if not result:
-            candidates = getattr(response, "candidates", None)
-            if candidates:
-                parts = []
-                for c in candidates:
-                    val = getattr(c, "content", None) or getattr(c, "output", None) or getattr(c, "text", None)
-                    if val:
-                        parts.append(str(val))
-                    else:
-                        parts.append(str(c))
-                result = "\n".join(parts)
-            else:
-                result = str(response)
-
-        if isinstance(result, str):
-            return result.strip()
-        else:
-            return str(result).strip()
-
+        return scheduled_strategic_insight(get_gemini_scheduler(), client, divisi, cluster, cluster_definition, model_name, output_mode, trace)
+    except SchedulerBusyError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error saat memanggil Gemini API (Call 1 - Text Mode): {e}")
         return None
 
-# (Fungsi to_excel tidak berubah)
-def to_excel(df):
+# --- Cache workbook: parsing .xlsx hanya sekali per hash isi file ---
+WORKBOOK_CACHE_MAX_ENTRIES = 8
+
+@st.cache_data(max_entries=WORKBOOK_CACHE_MAX_ENTRIES, show_spinner="Membaca workbook...")
+def load_workbook_sheets(file_hash: str, _excel_data: bytes, _trace: RunTrace = None) -> dict:
+    """
+    Mem-parsing seluruh sheet workbook menjadi DataFrame satu kali per hash isi file.
+    Hasilnya dibagikan lintas rerun dan sesi (LRU, dibatasi WORKBOOK_CACHE_MAX_ENTRIES),
+    sehingga pergantian selectbox tidak lagi mem-parsing ulang .xlsx lewat openpyxl.
+
+    Returns:
+        (dict): {nama_sheet: DataFrame}. Sheet CLUSTER dibaca tanpa header.
     """
-    Mengkonversi DataFrame menjadi file Excel di dalam memori (bytes).
+    return read_workbook_sheets(_excel_data, _trace)
+
+@st.cache_data(max_entries=WORKBOOK_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_cluster_definition_index(file_hash: str, _excel_data: bytes, _trace: RunTrace = None) -> dict:
     """
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Perbandingan_Strategi')
-        for column in df:
-            column_length = max(df[column].astype(str).map(len).max(), len(column)) + 2
-            col_idx = df.columns.get_loc(column)
-            writer.sheets['Perbandingan_Strategi'].column_dimensions[openpyxl.utils.get_column_letter(col_idx + 1)].width = column_length
-            
-    processed_data = output.getvalue()
-    return processed_data
+    Indeks {divisi: {cluster: definisi}} dari sheet CLUSTER, dibangun satu kali per workbook.
+    Lookup untuk sheet mana pun cukup `index.get(division_key(sheet), {})`.
+    Tahap hanya tercatat di `_trace` saat benar-benar dihitung (cache miss).
+    """
+    return build_workbook_cluster_index(load_workbook_sheets(file_hash, _excel_data, _trace), _trace)
+
+
+# Satu entri per (workbook, sheet): yang disalin per rerun hanya indeks sheet aktif.
+PROGRAM_INDEX_CACHE_MAX_ENTRIES = WORKBOOK_CACHE_MAX_ENTRIES * 16
+
+@st.cache_data(max_entries=PROGRAM_INDEX_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_sheet_program_index(file_hash: str, sheet_name: str, _excel_data: bytes, _trace: RunTrace = None) -> dict:
+    """
+    Indeks program existing per cluster untuk satu sheet (lihat `build_sheet_program_index`),
+    dibangun satu kali per workbook. Pergantian cluster dan mode batch cukup lookup dict.
+
+    Returns:
+        (dict): Indeks sheet, atau None jika sheet tidak memiliki kolom 'Cluster',
+            'Program Kerja', dan 'Deskripsi'.
+    """
+    sheets = load_workbook_sheets(file_hash, _excel_data, _trace)
+    return build_workbook_program_index(sheets, [sheet_name], _trace).get(sheet_name)
+
+# Indeks CSV bisa sangat besar: disimpan sebagai satu objek bersama (cache_resource, tanpa
+# salinan per rerun) dan hanya dibaca oleh UI.
+@st.cache_resource(max_entries=WORKBOOK_CACHE_MAX_ENTRIES, show_spinner="Membaca CSV per chunk...")
+def load_csv_program_index(file_hash: str, division_column: str, _csv_data: bytes, _trace: RunTrace = None) -> dict:
+    """
+    Indeks program existing dari CSV (lihat `build_csv_program_index`), dibangun satu kali
+    per isi file dan kolom divisi.
+
+    Returns:
+        (dict): {divisi: indeks program}.
+    """
+    return build_csv_program_index(_csv_data, division_column, trace=_trace)
+
+@st.cache_data(max_entries=WORKBOOK_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_csv_cluster_index(file_hash: str, division_names: tuple, _csv_data: bytes, _trace: RunTrace = None) -> dict:
+    """
+    Indeks {divisi: {cluster: definisi}} dari CSV definisi cluster pendamping.
+    """
+    return build_csv_cluster_index(_csv_data, list(division_names), trace=_trace)
+
+@st.cache_data(max_entries=WORKBOOK_CACHE_MAX_ENTRIES, show_spinner="Membandingkan workbook...")
+def load_workbook_comparison(file_hashes: tuple, file_names: tuple, _workbooks: list, _trace: RunTrace = None) -> dict:
+    """
+    Perbandingan lintas workbook (lihat `compare_workbooks`), dihitung satu kali per
+    kombinasi isi file. Workbook di-parsing paralel di process pool.
+
+    Returns:
+        (dict): 'labels', 'summary', dan 'programs'.
+    """
+    return compare_workbooks(list(file_names), _workbooks, trace=_trace)
+
+# --- Ekspor lazy: file Excel baru dibuat saat tombol download diklik ---
+EXPORT_CACHE_MAX_ENTRIES = 16
+
+def deferred_excel_export(export_key: tuple, build_df, trace: RunTrace = None):
+    """
+    Membuat callable untuk `st.download_button(data=...)`: DataFrame dan file Excel
+    baru dibangun saat pengguna mengklik download, lalu disimpan per `export_key`
+    (per sesi, maks. EXPORT_CACHE_MAX_ENTRIES) agar download berulang tidak
+    men-serialisasi ulang.
+
+    Args:
+        export_key (tuple): Mis. (file_hash, sheet, cluster, hash_insight).
+        build_df (callable): Fungsi tanpa argumen yang mengembalikan DataFrame ekspor,
+            atau dict {nama_sheet: DataFrame} untuk file dengan beberapa sheet.
+        trace (RunTrace): Jika diisi, pembuatan file dicatat sebagai tahap 'export'.
+    """
+    # Dict diambil di thread skrip; callable dijalankan Streamlit di luar konteks skrip.
+    export_cache = st.session_state.setdefault('export_cache', {})
+
+    def build_excel_bytes():
+        excel_bytes = export_cache.get(export_key)
+        if excel_bytes is None:
+            with (trace or RunTrace()).stage('export') as event:
+                export_df = build_df()
+                if isinstance(export_df, dict):
+                    excel_bytes = to_excel_sheets(export_df)
+                    rows = sum(len(df) for df in export_df.values())
+                else:
+                    excel_bytes = to_excel(export_df)
+                    rows = len(export_df)
+                event.update(rows=rows, kb=round(len(excel_bytes) / 1024, 1))
+            while len(export_cache) >= EXPORT_CACHE_MAX_ENTRIES:
+                export_cache.pop(next(iter(export_cache)))
+            export_cache[export_key] = excel_bytes
+        return excel_bytes
+
+    return build_excel_bytes
 
 
 # --- 4. STREAMLIT APP LAYOUT ---
 
-# (Sidebar tidak berubah)
+# Sidebar: opsi cache, streaming, format output, serta statistik cache / scheduler / prompt
 with st.sidebar:
     st.header("Opsi Analisis")
     use_caching = st.checkbox(
         "Gunakan Cache Hasil Analisis", 
         value=True,
-        help="Jika diaktifkan, hasil analisis sebelumnya akan disimpan. Matikan fitur ini jika Anda ingin AI menganalisis ulang."
+        help="Jika diaktifkan, hasil analisis yang tersimpan di cache bersama (lintas sesi dan pengguna) akan dipakai ulang. Matikan fitur ini jika Anda ingin AI menganalisis ulang; hasil baru tetap akan memperbarui cache."
     )
+    use_streaming = st.checkbox(
+        "Tampilkan Output AI Secara Streaming",
+        value=True,
+        help="Jika diaktifkan, insight AI ditampilkan bertahap selama Gemini masih menulis jawaban (hanya untuk format Teks)."
+    )
+    output_mode_label = st.radio(
+        "Format Output AI",
+        ["Teks", "JSON Terstruktur"],
+        help="JSON Terstruktur meminta Gemini mengisi schema (program, deskripsi, OKR, sumber) secara langsung, sehingga tidak ada tahap parsing teks."
+    )
+    output_mode = OUTPUT_MODE_JSON if output_mode_label == "JSON Terstruktur" else OUTPUT_MODE_TEXT
     st.markdown("---")
     st.info("Aplikasi ini memanggil 1 API Call per analisis. Fitur 'Gunakan Cache' sangat disarankan untuk menghemat kuota API.")
+    cache_stats = get_insight_cache().stats()
+    st.caption(
+        f"Cache insight: {cache_stats['entries']} entri | hit {cache_stats['hits']} | miss {cache_stats['misses']} | "
+        f"manifest {get_insight_manifest().stats()['entries']} cluster"
+    )
+    scheduler_stats = get_gemini_scheduler().stats()
+    st.caption(
+        f"Scheduler Gemini: {scheduler_stats['calls']} panggilan | digabung {scheduler_stats['coalesced']} | "
+        f"retry {scheduler_stats['retries']} | antre {scheduler_stats['waiting']} | ditolak {scheduler_stats['rejected']}"
+    )
+    prompt_stats = prompt_budget.stats()
+    st.caption(
+        f"Prompt: batas definisi {prompt_budget.definition_token_budget} token | dipadatkan {prompt_stats['compacted']} | "
+        f"dipotong {prompt_stats['truncated']} | context cache aktif {prompt_stats['context_caches']}"
+    )
+    # Diisi di akhir skrip, setelah semua tahap rerun ini tercatat.
+    diagnostics_placeholder = st.empty()
+
+# --- Instrumentasi: satu trace per rerun, event dikirim ke metrik proses ---
+session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex[:8])
+run_trace = RunTrace(get_insight_metrics(), session=session_id)
+
+# --- TAMPILAN HASIL CLUSTER: result store per sesi + CSS statis ---
+# Hasil yang sudah di-generate (teks, record hasil parsing, markdown jadi) disimpan per
+# (input, divisi, cluster, mode output). Rerun berikutnya (klik download, ganti widget)
+# menampilkan ulang dari store tanpa parsing atau penyusunan string.
+RESULT_STORE_MAX_ENTRIES = 16
+
+RESULT_VIEW_CSS = """
+<style>
+/* Memilih kolom pertama (div) di dalam sebuah stHorizontalBlock */
+div[data-testid="stHorizontalBlock"] > div:first-child {
+    border-right: 1px solid rgba(255, 255, 255, 0.2); /* Garis putih transparan */
+    padding-right: 24px; /* Sesuaikan dengan 'gap' Anda */
+}
+
+/* Memilih kolom kedua (div) di dalam sebuah stHorizontalBlock */
+div[data-testid="stHorizontalBlock"] > div:nth-child(2) {
+    padding-left: 24px; /* Sesuaikan dengan 'gap' Anda */
+}
+
+/* CSS untuk fallback box jika regex gagal */
+.ai-pre { 
+    background-color: rgba(255,255,255,0.02);
+    border: 1px solid rgba(255,255,255,0.06);
+    border-radius: 8px;
+    padding: 12px;
+    overflow-x: auto;
+    font-family: monospace;
+}
+</style>
+"""
+
+
+def store_cluster_result(result_key: tuple, record: dict):
+    """
+    Menyimpan hasil satu cluster ke result store sesi (entri tertua dibuang setelah
+    RESULT_STORE_MAX_ENTRIES).
+    """
+    result_store = st.session_state.setdefault('result_store', {})
+    result_store.pop(result_key, None)
+    while len(result_store) >= RESULT_STORE_MAX_ENTRIES:
+        result_store.pop(next(iter(result_store)))
+    result_store[result_key] = record
+
+
+def render_cluster_result(record: dict):
+    """
+    Menampilkan perbandingan existing vs AI dari record result store (markdown sudah jadi).
+    """
+    st.subheader(f"Perbandingan Strategis: {record['cluster']}")
+
+    st.download_button(
+        label="📥 Download Hasil ke Excel",
+        data=deferred_excel_export(
+            (record['source_hash'], record['divisi'], record['cluster'], record['insight_hash']),
+            lambda: build_comparison_df(record['existing_data_list'], record['ai_data_list'], record['ai_matches']),
+            run_trace
+        ),
+        file_name=f"Analisis_{record['divisi']}_{record['cluster']}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        use_container_width=True
+    )
+
+    # CSS garis vertikal antar kolom & kotak teks mentah (sekali per tampilan hasil)
+    st.markdown(RESULT_VIEW_CSS, unsafe_allow_html=True)
+
+    if not record['existing_markdown'] and not record['ai_markdown'] and not record['parse_failed']:
+        st.warning(f"Tidak ada Program Kerja (Existing) atau Insight AI (New) yang ditemukan untuk cluster '{record['cluster']}'.")
+        return
+
+    header_col1, header_col2 = st.columns(2, gap="medium")
+    with header_col1:
+        st.markdown("#### Mapping dari Spreadsheet")
+    with header_col2:
+        st.markdown("#### Insight AI")
+        if record['duplicate_count']:
+            st.caption(
+                f"⚠️ {record['duplicate_count']} dari {len(record['ai_matches'])} insight AI mirip program existing "
+                f"(kemiripan ≥ {PROGRAM_DUPLICATE_THRESHOLD:.0%})."
+            )
 
-# (Logika Upload & Parsing Excel tidak berubah)
-uploaded_file = st.file_uploader(
+    col1, col2 = st.columns(2, gap="medium")
+
+    # --- KOLOM KIRI (EXISTING) ---
+    with col1:
+        if record['existing_markdown']:
+            st.markdown(record['existing_markdown'])
+        elif not record['parse_failed']:
+            st.markdown("*(Tidak ada data existing)*")
+
+    # --- KOLOM KANAN (AI) ---
+    with col2:
+        if record['parse_failed']:
+            st.error("Gagal mem-parsing output AI, menampilkan teks mentah:")
+            st.markdown(record['ai_raw_html'], unsafe_allow_html=True)
+        elif record['ai_markdown']:
+            st.markdown(record['ai_markdown'])
+        elif not record['existing_markdown']:
+            st.markdown("*(Tidak ada insight AI)*")
+        else:
+            st.markdown(" ") # Beri spasi agar sejajar
+
+    if record['sources_markdown']:
+        st.markdown("---") # Garis pemisah dari kolom
+        st.markdown(record['sources_markdown'])
+
+
+# --- ANALISIS PER DIVISI & CLUSTER (sama untuk input .xlsx dan .csv) ---
+def render_division_analysis(source_hash: str, division_names: list, cluster_index: dict, load_program_index, division_label: str):
+    """
+    Menampilkan pemilihan divisi/cluster, mode batch, dan perbandingan insight AI.
+
+    Args:
+        source_hash (str): Hash isi input (kunci hasil batch dan cache ekspor).
+        division_names (list): Divisi yang bisa dipilih (nama sheet atau nilai kolom divisi CSV).
+        cluster_index (dict): {divisi: {cluster: definisi}}, lihat `division_key`.
+        load_program_index (callable): Nama divisi -> indeks program existing (atau None
+            jika data divisi tidak memiliki kolom 'Cluster', 'Program Kerja', 'Deskripsi').
+        division_label (str): Label selectbox divisi.
+    """
+    selected_sheet = st.selectbox(
+        division_label,
+        division_names,
+        index=0,
+        key='sheet_selector'
+    )
+    
+    if selected_sheet:
+        st.session_state.cluster_dict = cluster_index.get(division_key(selected_sheet), {})
+        sheet_program_index = load_program_index(selected_sheet)
+
+        if sheet_program_index is not None:
+            available_clusters = sheet_program_index['clusters']
+            
+            if not available_clusters:
+                st.warning(f"Sheet '{selected_sheet}' tidak memiliki data valid di kolom 'Cluster'.")
+                selected_cluster = None 
+            else:
+                selected_cluster = st.selectbox(
+                    "Pilih Cluster yang Akan Dianalisis:",
+                    available_clusters,
+                    index=0,
+                    key=f'cluster_selector_{selected_sheet}' 
+                )
+
+            # --- MODE BATCH: GENERATE SEMUA CLUSTER ---
+            with st.expander("⚡ Mode Batch: Generate Semua Cluster"):
+                batch_scope = st.radio(
+                    "Cakupan:",
+                    ["Sheet terpilih", "Semua sheet"],
+                    horizontal=True,
+                    key='batch_scope'
+                )
+                batch_concurrency = st.slider(
+                    "Jumlah panggilan Gemini paralel:",
+                    min_value=1,
+                    max_value=BATCH_MAX_CONCURRENCY,
+                    value=BATCH_DEFAULT_CONCURRENCY,
+                    key='batch_concurrency'
+                )
+                incremental = st.checkbox(
+                    "Inkremental: hanya cluster yang berubah sejak analisis terakhir",
+                    value=True,
+                    disabled=not use_caching,
+                    key='batch_incremental',
+                    help="Cluster dengan definisi, prompt, dan model yang sama seperti analisis terakhir memakai insight tersimpan; hanya cluster baru atau berubah yang dikirim ke Gemini. Tidak berlaku jika 'Gunakan Cache' dimatikan."
+                ) and use_caching
+
+                if st.button("⚡ Generate Insight untuk Semua Cluster", use_container_width=True):
+                    batch_sheets = [selected_sheet] if batch_scope == "Sheet terpilih" else division_names
+                    batch_program_index = {}
+                    for sheet in batch_sheets:
+                        sheet_index = load_program_index(sheet)
+                        if sheet_index is not None:
+                            batch_program_index[sheet] = sheet_index
+                    batch_jobs, skipped_clusters = collect_cluster_jobs(batch_program_index, cluster_index, batch_sheets)
+
+                    if skipped_clusters:
+                        st.warning("Dilewati (definisi tidak ditemukan di Sheet CLUSTER): " + ", ".join(skipped_clusters))
+
+                    if batch_jobs:
+                        progress_bar = st.progress(0.0, text=f"0/{len(batch_jobs)} cluster selesai")
+                        results_container = st.container()
+                        status_icons = {'cache': "💾 cache", 'manifest': "♻️ tidak berubah", 'api': "✅ Gemini", 'error': "❌ error"}
+                        completed = []
+
+                        def show_batch_result(result):
+                            completed.append(result)
+                            progress_bar.progress(
+                                len(completed) / len(batch_jobs),
+                                text=f"{len(completed)}/{len(batch_jobs)} cluster selesai"
+                            )
+                            with results_container.expander(f"{status_icons[result['status']]} — {result['divisi']} / {result['cluster']}"):
+                                if result['error']:
+                                    st.error(result['error'])
+                                else:
+                                    batch_ai_items, _, _, batch_parse_failed = parse_ai_response(result['text'])
+                                    if batch_parse_failed or not batch_ai_items:
+                                        st.text(result['text'])
+                                    else:
+                                        st.markdown("\n\n---\n\n".join(batch_ai_items))
+
+                        revision_diff = None
+                        if incremental:
+                            incremental_run = run_incremental_insights(
+                                batch_program_index,
+                                cluster_index,
+                                client,
+                                get_insight_cache(),
+                                get_gemini_scheduler(),
+                                get_insight_manifest(),
+                                sheet_names=batch_sheets,
+                                model_name=GEMINI_MODEL_NAME,
+                                output_mode=output_mode,
+                                max_workers=batch_concurrency,
+                                on_result=show_batch_result,
+                                trace=run_trace
+                            )
+                            batch_results = incremental_run['results']
+                            revision_diff = build_revision_diff_df(incremental_run['diff'])
+                        else:
+                            batch_results = run_insight_batch(
+                                batch_jobs,
+                                client,
+                                get_insight_cache(),
+                                get_gemini_scheduler(),
+                                model_name=GEMINI_MODEL_NAME,
+                                use_caching=use_caching,
+                                max_workers=batch_concurrency,
+                                on_result=show_batch_result,
+                                output_mode=output_mode,
+                                trace=run_trace
+                            )
+                        st.session_state.batch_result = {
+                            'source_hash': source_hash,
+                            'scope': batch_sheets,
+                            'insight_hash': hash_text("".join(result['text'] or "" for result in batch_results)),
+                            'df': build_batch_comparison_df(batch_results, batch_program_index),
+                            'diff': revision_diff
+                        }
+                    else:
+                        st.warning("Tidak ada cluster dengan definisi valid untuk diproses.")
+
+                batch_result = st.session_state.get('batch_result')
+                if batch_result and batch_result['source_hash'] == source_hash:
+                    revision_diff = batch_result.get('diff')
+                    if revision_diff is not None:
+                        changed_diff = revision_diff[revision_diff['Perubahan'] != CHANGE_LABELS[CHANGE_UNCHANGED]]
+                        st.markdown("#### Perubahan Sejak Analisis Terakhir")
+                        st.caption(
+                            f"{int((revision_diff['Insight Baru'] == 'Ya').sum())} cluster dianalisis ulang | "
+                            f"{len(revision_diff) - len(changed_diff)} tidak berubah (insight tersimpan dipakai ulang)"
+                        )
+                        if not changed_diff.empty:
+                            st.dataframe(changed_diff, use_container_width=True, hide_index=True)
+                    st.markdown("#### Perbandingan Gabungan")
+                    st.dataframe(batch_result['df'], use_container_width=True, hide_index=True)
+                    st.download_button(
+                        label="📥 Download Perbandingan Gabungan ke Excel",
+                        data=deferred_excel_export(
+                            ('batch', source_hash, tuple(batch_result['scope']), batch_result['insight_hash']),
+                            lambda: batch_result['df'],
+                            run_trace
+                        ),
+                        file_name=f"Analisis_Batch_{'_'.join(batch_result['scope']) if len(batch_result['scope']) == 1 else 'Semua_Divisi'}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        use_container_width=True
+                    )
+            
+            if selected_cluster:
+                cluster_definition = st.session_state.cluster_dict.get(selected_cluster.strip(), MISSING_DEFINITION_TEXT)
+                
+                if "Definisi tidak ditemukan" not in cluster_definition:
+                    st.info(f"**Definisi Cluster:** {cluster_definition}")
+                else:
+                    st.error(f"**Definisi Cluster:** {cluster_definition}")
+
+                disable_button = "Definisi tidak ditemukan" in cluster_definition
+                result_key = (source_hash, selected_sheet, selected_cluster, output_mode)
+                generated_now = False
+                
+                if st.button(f"🚀 Generate Insight untuk Cluster '{selected_cluster}'", use_container_width=True, disabled=disable_button):
+                    
+                    # --- 1. AMBIL DAN PROSES DATA KIRI (EXISTING) ---
+                    with run_trace.stage('existing_programs', divisi=selected_sheet, cluster=selected_cluster):
+                        existing_markdown_items, existing_data_list = get_existing_programs(sheet_program_index, selected_cluster)
+                    
+                    # --- 2. AMBIL DAN PROSES DATA KANAN (AI) ---
+                    insight_cache = get_insight_cache()
+                    cache_key = insight_cache_key(selected_sheet, selected_cluster, cluster_definition, GEMINI_MODEL_NAME, output_mode)
+                    with run_trace.stage('cache_lookup', divisi=selected_sheet, cluster=selected_cluster) as cache_event:
+                        ai_text_response = insight_cache.get(cache_key) if use_caching else None
+                        cache_event['cache'] = 'hit' if ai_text_response else 'miss'
+                    
+                    if ai_text_response:
+                        st.toast("Mengambil hasil dari cache...")
+                    elif use_streaming and output_mode == OUTPUT_MODE_TEXT:
+                        scheduler = get_gemini_scheduler()
+                        inflight_future, is_owner = scheduler.claim(cache_key)
+                        if not is_owner:
+                            # Permintaan identik sedang berjalan (sesi lain): tunggu hasil yang sama.
+                            with st.spinner(f"Menunggu analisis '{selected_cluster}' yang sedang berjalan..."):
+                                try:
+                                    ai_text_response = scheduler.wait(inflight_future)
+                                except Exception as e:
+                                    st.error(f"Error saat memanggil Gemini API (Call 1 - Streaming Mode): {e}")
+                                    ai_text_response = None
+                        else:
+                            stream_preview = st.empty()
+                            try:
+                                with stream_preview.container():
+                                    st.subheader(f"Perbandingan Strategis: {selected_cluster}")
+                                    stream_col1, stream_col2 = st.columns(2, gap="medium")
+                                    with stream_col1:
+                                        st.markdown("#### Mapping dari Spreadsheet")
+                                        st.markdown("\n\n---\n\n".join(existing_markdown_items) or "*(Tidak ada data existing)*")
+                                    with stream_col2:
+                                        st.markdown("#### Insight AI")
+                                        ai_stream_placeholder = st.empty()
+                                        ai_stream_placeholder.markdown("*Gemini sedang menulis...*")
+
+                                stream_parser = StreamingInsightParser()
+                                for chunk in scheduled_strategic_insight_stream(
+                                    scheduler,
+                                    client,
+                                    divisi=selected_sheet, cluster=selected_cluster,
+                                    cluster_definition=cluster_definition,
+                                    model_name=GEMINI_MODEL_NAME,
+                                    trace=run_trace
+                                ):
+                                    stream_parser.feed(chunk)
+                                    partial_items = list(stream_parser.markdown_items)
+                                    if stream_parser.pending_text():
+                                        partial_items.append(stream_parser.pending_text() + " ▌")
+                                    ai_stream_placeholder.markdown("\n\n---\n\n".join(partial_items))
+                                ai_text_response = stream_parser.buffer.strip() or None
+                                if ai_text_response:
+                                    insight_cache.set(cache_key, ai_text_response, model_name=GEMINI_MODEL_NAME)
+                                inflight_future.set_result(ai_text_response)
+                            except Exception as e:
+                                scheduler.fail(inflight_future, e)
+                                st.error(f"Error saat memanggil Gemini API (Call 1 - Streaming Mode): {e}")
+                                ai_text_response = None
+                            except BaseException as e:
+                                scheduler.fail(inflight_future, e)
+                                raise
+                            stream_preview.empty()
+
+                        if not ai_text_response:
+                            st.error("Panggilan API 1 (Insight) gagal.")
+                    else:
+                        with st.spinner(f"Gemini menganalisis tren untuk '{selected_cluster}'..."):
+                            ai_text_response = get_gemini_strategic_insight(
+                                divisi=selected_sheet, cluster=selected_cluster,
+                                cluster_definition=cluster_definition, 
+                                model_name=GEMINI_MODEL_NAME,
+                                output_mode=output_mode,
+                                trace=run_trace
+                            )
+                        if ai_text_response:
+                            insight_cache.set(cache_key, ai_text_response, model_name=GEMINI_MODEL_NAME)
+                        else:
+                            st.error("Panggilan API 1 (Insight) gagal.")
+                            ai_text_response = None
+                    
+                    # --- 3. PARSING DATA AI (JIKA API SUKSES) ---
+                    with run_trace.stage('parse', divisi=selected_sheet, cluster=selected_cluster, output_mode=output_mode) as parse_event:
+                        ai_markdown_items, ai_data_list, sources_part, parse_failed = parse_ai_response(ai_text_response)
+                        parse_event.update(items=len(ai_data_list), parse_failed=parse_failed)
+
+                    # --- 3b. KEMIRIPAN AI vs EXISTING (deteksi duplikat) ---
+                    ai_matches = match_ai_programs(existing_data_list, ai_data_list, run_trace, divisi=selected_sheet, cluster=selected_cluster)
+                    duplicate_count = sum(1 for match in ai_matches if match['duplicate'])
+
+                    if ai_text_response:
+                        # --- 4. SIMPAN HASIL KE RESULT STORE (markdown dirender sekali di sini) ---
+                        store_cluster_result(result_key, {
+                            'source_hash': source_hash,
+                            'divisi': selected_sheet,
+                            'cluster': selected_cluster,
+                            'insight_hash': hash_text(ai_text_response),
+                            'existing_data_list': existing_data_list,
+                            'ai_data_list': ai_data_list,
+                            'ai_matches': ai_matches,
+                            'existing_markdown': "\n\n---\n\n".join(existing_markdown_items),
+                            'ai_markdown': "\n\n---\n\n".join(
+                                item + (f"  \n⚠️ *Mirip program existing: **{match['match_program']}** (kemiripan {match['score']:.0%})*" if match['duplicate'] else "")
+                                for item, match in zip(ai_markdown_items, ai_matches)
+                            ),
+                            'ai_raw_html': f"<div class='ai-pre'>{html.escape(ai_text_response)}</div>" if parse_failed else None,
+                            'sources_markdown': sources_part.strip() if sources_part and not parse_failed else None,
+                            'parse_failed': parse_failed,
+                            'duplicate_count': duplicate_count,
+                        })
+                        generated_now = True
+
+                    else:
+                        # Klik baru gagal: hasil lama cluster ini tidak ditampilkan di bawah pesan error.
+                        st.session_state.get('result_store', {}).pop(result_key, None)
+                        if not existing_markdown_items:
+                            # Handle jika API gagal total DAN tidak ada data existing
+                            st.error("Gagal mendapatkan insight dari AI dan tidak ada data existing untuk ditampilkan.")
+
+                # --- 5. TAMPILKAN HASIL DARI RESULT STORE (juga pada rerun berikutnya) ---
+                cluster_result = st.session_state.get('result_store', {}).get(result_key)
+                if cluster_result:
+                    render_started_at = time.perf_counter()
+                    render_cluster_result(cluster_result)
+                    run_trace.record(
+                        'render', (time.perf_counter() - render_started_at) * 1000,
+                        divisi=selected_sheet, cluster=selected_cluster, from_store=not generated_now
+                    )
+
+        else:
+            st.error(f"Sheet '{selected_sheet}' tidak memiliki kolom {', '.join(repr(column) for column in PROGRAM_INDEX_COLUMNS)}. Mohon periksa file Anda.")
+
+# Upload: satu .xlsx / .csv untuk analisis per divisi, beberapa .xlsx untuk mode perbandingan
+uploaded_files = st.file_uploader(
     "Upload your Excel (.xlsx) or CSV file",
     type=['xlsx', 'csv'],
-    accept_multiple_files=False
+    accept_multiple_files=True,
+    help="Upload beberapa file .xlsx sekaligus (mis. tahun ini dan tahun lalu) untuk mode perbandingan lintas workbook."
 )
+# Satu file: alur analisis biasa. Beberapa file: mode perbandingan di bawah.
+uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
 
 if 'cluster_dict' not in st.session_state:
     st.session_state.cluster_dict = {}
@@ -164,23 +720,18 @@ if uploaded_file is not None:
     
     if file_extension == 'xlsx':
         try:
-            SHEET_TO_DIVISION_MAP = {
-                "information technology": "it", 
-                "corporate legal & compliance": "corporate legal & compliance",
-                "operation": "operation",
-                "merchandising": "merchandising",
-                "marketing": "marketing",
-                "business controlling": "business controlling",
-                "service quality": "service quality",
-                "property development": "property development",
-                "corporate audit": "corporate audit",
-                "finance": "finance",
-                "human capital": "human capital"
-            }
-            
-            excel_data = uploaded_file.read()
-            xls = pd.ExcelFile(BytesIO(excel_data))
-            sheet_names = xls.sheet_names
+            file_read_started_at = time.perf_counter()
+            excel_data = uploaded_file.getvalue()
+            file_hash = hashlib.sha256(excel_data).hexdigest()
+            if st.session_state.get('traced_file_hash') != file_hash:
+                # Dicatat sekali per file baru, bukan di setiap rerun widget.
+                st.session_state.traced_file_hash = file_hash
+                run_trace.record(
+                    'file_read', (time.perf_counter() - file_read_started_at) * 1000,
+                    file=uploaded_file.name, workbook_kb=round(len(excel_data) / 1024, 1)
+                )
+            workbook_sheets = load_workbook_sheets(file_hash, excel_data, run_trace)
+            sheet_names = list(workbook_sheets.keys())
             
             cluster_sheet_name = None
             for name in sheet_names:
@@ -190,303 +741,128 @@ if uploaded_file is not None:
             
             sheet_names_to_select = [name for name in sheet_names if name.strip().lower() != 'cluster']
             
-            selected_sheet = st.selectbox(
-                "Pilih Divisi (Sheet) yang Akan Diproses:",
+            cluster_index = {}
+            if cluster_sheet_name:
+                try:
+                    cluster_index = load_cluster_definition_index(file_hash, excel_data, run_trace)
+                except Exception as e:
+                    st.error(f"Gagal mem-parsing sheet '{cluster_sheet_name}'. Error: {e}")
+
+            render_division_analysis(
+                file_hash,
                 sheet_names_to_select,
-                index=0,
-                key='sheet_selector'
+                cluster_index,
+                lambda sheet: load_sheet_program_index(file_hash, sheet, excel_data, run_trace),
+                "Pilih Divisi (Sheet) yang Akan Diproses:"
             )
-            
-            df = None
-            
-            if selected_sheet:
-                df = pd.read_excel(BytesIO(excel_data), sheet_name=selected_sheet)
-                
-                if cluster_sheet_name:
-                    try:
-                        df_cluster_def = pd.read_excel(BytesIO(excel_data), sheet_name=cluster_sheet_name, header=None)
-                        temp_cluster_dict = {}
-                        start_index = -1
-                        division_target = SHEET_TO_DIVISION_MAP.get(selected_sheet.strip().lower(), selected_sheet.strip().lower())
-                        all_division_names_lower = [v.lower() for v in SHEET_TO_DIVISION_MAP.values()]
-
-                        for index, row in df_cluster_def.iterrows():
-                            col_a_raw = str(row.iloc[0]).strip() if len(row) > 0 else ""
-                            if col_a_raw.lower() == division_target:
-                                start_index = index
-                                break
-                        
-                        if start_index != -1:
-                            for index in range(start_index + 1, len(df_cluster_def)):
-                                row = df_cluster_def.iloc[index]
-                                col_a_raw = str(row.iloc[0]).strip() if len(row) > 0 and not pd.isna(row.iloc[0]) else ""
-                                col_b_raw = str(row.iloc[1]).strip() if len(row) > 1 and not pd.isna(row.iloc[1]) else ""
-                                col_a_lower = col_a_raw.lower()
-                                is_empty_row = not col_a_raw and not col_b_raw
-                                is_other_division_header = col_a_lower in all_division_names_lower and col_a_lower != division_target and (not col_b_raw or col_b_raw.lower() == 'desc')
-                                if is_empty_row or is_other_division_header:
-                                    break
-                                if col_a_lower not in ['', 'cluster', 'nan'] and col_b_raw.lower() not in ['', 'desc', 'nan']:
-                                    temp_cluster_dict[col_a_raw] = col_b_raw
-                        st.session_state.cluster_dict = temp_cluster_dict
-                    except Exception as e:
-                        st.error(f"Gagal mem-parsing sheet '{cluster_sheet_name}'. Error: {e}")
-                        st.session_state.cluster_dict = {}
-                
-                if 'Cluster' in df.columns:
-                    all_clusters_unique = df['Cluster'].dropna().astype(str).str.strip().unique().tolist()
-                    all_clusters_in_sheet = [c for c in all_clusters_unique if c.lower() not in ['cluster', 'nan']]
-                    available_clusters = []
-                    if selected_sheet.strip().lower() == "operation":
-                        logistics_only_clusters = [
-                            "Inventory & Stock Management",
-                            "Supplier & Service Level",
-                            "Warehouse & Project Execution",
-                            "System Development"
-                        ]
-                        available_clusters = sorted(
-                            [c for c in all_clusters_in_sheet if c not in logistics_only_clusters]
-                        )
-                    else:
-                        available_clusters = sorted(all_clusters_in_sheet)
-                    
-                    if not available_clusters:
-                        st.warning(f"Sheet '{selected_sheet}' tidak memiliki data valid di kolom 'Cluster'.")
-                        selected_cluster = None 
-                    else:
-                        selected_cluster = st.selectbox(
-                            "Pilih Cluster yang Akan Dianalisis:",
-                            available_clusters,
-                            index=0,
-                            key=f'cluster_selector_{selected_sheet}' 
-                        )
-                    
-                    if selected_cluster:
-                        cluster_definition = st.session_state.cluster_dict.get(selected_cluster.strip(), "(Definisi tidak ditemukan di Sheet CLUSTER)")
-                        
-                        if "Definisi tidak ditemukan" not in cluster_definition:
-                            st.info(f"**Definisi Cluster:** {cluster_definition}")
-                        else:
-                            st.error(f"**Definisi Cluster:** {cluster_definition}")
-
-                        disable_button = "Definisi tidak ditemukan" in cluster_definition
-                        
-                        if st.button(f"🚀 Generate Insight untuk Cluster '{selected_cluster}'", use_container_width=True, disabled=disable_button):
-                            
-                            # --- 1. AMBIL DAN PROSES DATA KIRI (EXISTING) ---
-                            existing_df = df[df['Cluster'].astype(str).str.strip() == selected_cluster][['Program Kerja', 'Deskripsi']]
-                            existing_markdown_items = []
-                            existing_data_list = [] 
-                            
-                            if not existing_df.empty:
-                                for index, row in existing_df.iterrows():
-                                    program = row['Program Kerja']
-                                    deskripsi = row['Deskripsi']
-                                    item_string = "" 
-                                    if pd.notna(program) and str(program).strip():
-                                        item_string += f"**Program:** {program}  \n" 
-                                        if pd.notna(deskripsi) and str(deskripsi).strip():
-                                            item_string += f"**Deskripsi:** {deskripsi}"
-                                        if item_string:
-                                            existing_markdown_items.append(item_string)
-                                            existing_data_list.append({'program': program, 'deskripsi': deskripsi})
-                            
-                            # --- 2. AMBIL DAN PROSES DATA KANAN (AI) ---
-                            definition_hash = hashlib.md5(cluster_definition.encode()).hexdigest()[:8]
-                            cache_key = f"insight_text_{selected_sheet}_{selected_cluster}_{definition_hash}"
-                            ai_text_response = None
-                            
-                            if use_caching and cache_key in st.session_state:
-                                st.toast("Mengambil hasil dari cache...")
-                                ai_text_response = st.session_state[cache_key]
-                            else:
-                                with st.spinner(f"Gemini menganalisis tren untuk '{selected_cluster}'..."):
-                                    ai_text_response = get_gemini_strategic_insight(
-                                        divisi=selected_sheet, cluster=selected_cluster,
-                                        cluster_definition=cluster_definition, 
-                                        model_name="gemini-2.5-flash"
-                                    )
-                                if ai_text_response:
-                                    if use_caching: st.session_state[cache_key] = ai_text_response
-                                else:
-                                    st.error("Panggilan API 1 (Insight) gagal.")
-                                    ai_text_response = None
-                            
-                            # --- 3. PARSING DATA AI (JIKA API SUKSES) ---
-                            ai_markdown_items = []
-                            ai_data_list = [] 
-                            sources_part = ""
-                            regex_failed = False
-
-                            if ai_text_response:
-                                if not isinstance(ai_text_response, str):
-                                    ai_text_response = str(ai_text_response)
-
-                                content_part = ai_text_response
-                                if "\nSumber" in ai_text_response:
-                                    parts = ai_text_response.split("\nSumber", 1)
-                                    content_part = parts[0]
-                                    sources_part = "\nSumber" + parts[1] 
-                                elif "Sumber:" in ai_text_response:
-                                    parts = ai_text_response.split("Sumber:", 1)
-                                    content_part = parts[0]
-                                    sources_part = "Sumber:" + parts[1]
-                                
-                                pattern = re.compile(
-                                    r"[•*-]\s*Program:\s*(.*?)" +                         
-                                    r"(?:\n\s+[•*-]?\s*Deskripsi:\s*)(.*?)" +             
-                                    r"(?:\n\s+[•*-]?\s*OKR\s*:\s*)(.*?)" +                
-                                    r"(?=\n\s*[•*-]\s*Program:|\Z)",                    
-                                    re.DOTALL | re.IGNORECASE
-                                )
-                                matches = pattern.findall(content_part)
-                                
-                                if matches:
-                                    for match in matches:
-                                        program = match[0].strip()
-                                        deskripsi = match[1].strip()
-                                        okr = match[2].strip()
-                                        item_string = f"**Program:** {program}  \n"
-                                        item_string += f"**Deskripsi:** {deskripsi}  \n"
-                                        item_string += f"**OKR :** {okr}"
-                                        ai_markdown_items.append(item_string)
-                                        ai_data_list.append({'program': program, 'deskripsi': deskripsi, 'okr': okr})
-                                else:
-                                    if ai_text_response and not sources_part:
-                                        regex_failed = True 
-                                
-                                # --- 4. TAMPILKAN HASIL (DAN TOMBOL DOWNLOAD) ---
-                                
-                                st.subheader(f"Perbandingan Strategis: {selected_cluster}")
-
-                                # (Logika Tombol Download tidak berubah)
-                                all_rows_data = []
-                                max_rows_for_df = max(len(existing_data_list), len(ai_data_list))
-                                for i in range(max_rows_for_df):
-                                    row_data = {}
-                                    if i < len(existing_data_list):
-                                        row_data['Program_Existing'] = existing_data_list[i]['program']
-                                        row_data['Deskripsi_Existing'] = existing_data_list[i]['deskripsi']
-                                    else:
-                                        row_data['Program_Existing'] = None
-                                        row_data['Deskripsi_Existing'] = None
-                                    if i < len(ai_data_list):
-                                        row_data['Program_AI'] = ai_data_list[i]['program']
-                                        row_data['Deskripsi_AI'] = ai_data_list[i]['deskripsi']
-                                        row_data['OKR_AI'] = ai_data_list[i]['okr']
-                                    else:
-                                        row_data['Program_AI'] = None
-                                        row_data['Deskripsi_AI'] = None
-                                        row_data['OKR_AI'] = None
-                                    all_rows_data.append(row_data)
-
-                                df_download = pd.DataFrame(all_rows_data, columns=[
-                                    'Program_Existing', 'Deskripsi_Existing', 
-                                    'Program_AI', 'Deskripsi_AI', 'OKR_AI'
-                                ])
-                                excel_bytes = to_excel(df_download)
-                                
-                                st.download_button(
-                                    label="📥 Download Hasil ke Excel",
-                                    data=excel_bytes,
-                                    file_name=f"Analisis_{selected_sheet}_{selected_cluster}.xlsx",
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                    use_container_width=True
-                                )
-
-                                # 1. Tambahkan CSS untuk garis vertikal
-                                st.markdown("""
-                                <style>
-                                /* Memilih kolom pertama (div) di dalam sebuah stHorizontalBlock */
-                                div[data-testid="stHorizontalBlock"] > div:first-child {
-                                    border-right: 1px solid rgba(255, 255, 255, 0.2); /* Garis putih transparan */
-                                    padding-right: 24px; /* Sesuaikan dengan 'gap' Anda */
-                                }
-                                
-                                /* Memilih kolom kedua (div) di dalam sebuah stHorizontalBlock */
-                                div[data-testid="stHorizontalBlock"] > div:nth-child(2) {
-                                    padding-left: 24px; /* Sesuaikan dengan 'gap' Anda */
-                                }
-
-                                /* CSS untuk fallback box jika regex gagal */
-                                .ai-pre { 
-                                    background-color: rgba(255,255,255,0.02);
-                                    border: 1px solid rgba(255,255,255,0.06);
-                                    border-radius: 8px;
-                                    padding: 12px;
-                                    overflow-x: auto;
-                                    font-family: monospace;
-                                } 
-                                </style>
-                                """, unsafe_allow_html=True) 
-
-                                # 2. Cek apakah ada data untuk ditampilkan
-                                max_rows = max(len(existing_markdown_items), len(ai_markdown_items))
-
-                                if max_rows == 0 and not regex_failed:
-                                    st.warning(f"Tidak ada Program Kerja (Existing) atau Insight AI (New) yang ditemukan untuk cluster '{selected_cluster}'.")
-                                
-                                else:
-                                    # 3. Buat Judul Kolom
-                                    header_col1, header_col2 = st.columns(2, gap="medium")
-                                    with header_col1:
-                                        st.markdown("#### Mapping dari Spreadsheet")
-                                    with header_col2:
-                                        st.markdown("#### Insight AI")
-
-                                    # 4. Buat Kolom Konten
-                                    col1, col2 = st.columns(2, gap="medium")
-                                    
-                                    # --- KOLOM KIRI (EXISTING) ---
-                                    with col1:
-                                        # Gabungkan kembali dengan '---'
-                                        final_existing_markdown = "\n\n---\n\n".join(existing_markdown_items)
-                                        if final_existing_markdown:
-                                            st.markdown(final_existing_markdown)
-                                        elif not regex_failed: 
-                                            st.markdown("*(Tidak ada data existing)*") 
-
-                                    # --- KOLOM KANAN (AI) ---
-                                    with col2:
-                                        if regex_failed:
-                                            st.error("Gagal mem-parsing output AI, menampilkan teks mentah:")
-                                            st.markdown(f"<div class='ai-pre'>{html.escape(ai_text_response)}</div>", unsafe_allow_html=True)
-                                        else:
-                                            # Gabungkan kembali dengan '---'
-                                            # JANGAN tambahkan 'sources_part' di sini
-                                            final_ai_markdown = "\n\n---\n\n".join(ai_markdown_items)
-                                            
-                                            if final_ai_markdown:
-                                                st.markdown(final_ai_markdown)
-                                            elif not existing_markdown_items:
-                                                st.markdown("*(Tidak ada insight AI)*")
-                                            else:
-                                                st.markdown(" ") # Beri spasi agar sejajar
-
-                                    if sources_part and not regex_failed:
-                                        st.markdown("---") # Garis pemisah dari kolom
-                                        st.markdown(sources_part.strip())
-
-                            elif not ai_text_response and not existing_markdown_items:
-                                # Handle jika API gagal total DAN tidak ada data existing
-                                st.error("Gagal mendapatkan insight dari AI dan tidak ada data existing untuk ditampilkan.")
-
-                else:
-                    st.error(f"Sheet '{selected_sheet}' tidak memiliki kolom 'Cluster'. Mohon periksa file Anda.")
 
         except Exception as e:
             safe_error = html.escape(str(e))
             st.error(f"An error occurred while reading the Excel file: {safe_error}")
             
     elif file_extension == 'csv':
-        st.warning("Mode CSV memiliki fungsionalitas terbatas.")
-        with st.spinner("Loading CSV file..."):
-            try:
-                df = pd.read_csv(uploaded_file)
-                st.dataframe(df.head())
-                st.info("Harap gunakan format .xlsx untuk fungsionalitas penuh (pemilihan Divisi dan Cluster).")
-            except Exception as e:
-                st.error(f"An error occurred while reading the CSV file: {e}")
+        try:
+            file_read_started_at = time.perf_counter()
+            csv_data = uploaded_file.getvalue()
+            csv_hash = hashlib.sha256(csv_data).hexdigest()
+            if st.session_state.get('traced_file_hash') != csv_hash:
+                st.session_state.traced_file_hash = csv_hash
+                run_trace.record(
+                    'file_read', (time.perf_counter() - file_read_started_at) * 1000,
+                    file=uploaded_file.name, csv_kb=round(len(csv_data) / 1024, 1)
+                )
+            csv_columns = read_csv_columns(csv_data)
+            detected_division_column = find_csv_column(csv_columns, CSV_DIVISION_COLUMNS)
+
+            col_division, col_definitions = st.columns(2)
+            with col_division:
+                division_column = st.selectbox(
+                    "Kolom Divisi (pengganti sheet):",
+                    csv_columns,
+                    index=csv_columns.index(detected_division_column) if detected_division_column else 0,
+                    key='csv_division_column'
+                )
+            with col_definitions:
+                cluster_file = st.file_uploader(
+                    "Upload CSV definisi cluster",
+                    type=['csv'],
+                    key='csv_cluster_file',
+                    help="Kolom Divisi, Cluster, Definisi — atau format blok yang sama dengan sheet CLUSTER."
+                )
+
+            csv_program_index = load_csv_program_index(csv_hash, division_column, csv_data, run_trace)
+            cluster_index = {}
+            cluster_hash = ""
+            if cluster_file is not None:
+                cluster_data = cluster_file.getvalue()
+                cluster_hash = hashlib.sha256(cluster_data).hexdigest()
+                cluster_index = load_csv_cluster_index(cluster_hash, tuple(csv_program_index), cluster_data, run_trace)
+            else:
+                st.info("Upload CSV definisi cluster agar insight AI bisa dibuat untuk setiap cluster.")
+
+            if not csv_program_index:
+                st.warning(f"Kolom '{division_column}' tidak berisi nama divisi.")
+            else:
+                render_division_analysis(
+                    hash_text(f"{csv_hash}:{division_column}:{cluster_hash}"),
+                    list(csv_program_index),
+                    cluster_index,
+                    csv_program_index.get,
+                    "Pilih Divisi yang Akan Diproses:"
+                )
+
+        except Exception as e:
+            safe_error = html.escape(str(e))
+            st.error(f"An error occurred while reading the CSV file: {safe_error}")
+
+# --- MODE PERBANDINGAN MULTI-WORKBOOK ---
+if len(uploaded_files) > 1:
+    workbook_files = [f for f in uploaded_files if f.name.split('.')[-1] == 'xlsx']
+    if len(workbook_files) < len(uploaded_files):
+        st.warning("Mode perbandingan hanya mendukung file .xlsx; file lain diabaikan.")
+    if len(workbook_files) < 2:
+        st.info("Upload minimal 2 file .xlsx untuk membandingkan workbook.")
+    else:
+        try:
+            workbooks = [f.getvalue() for f in workbook_files]
+            file_hashes = tuple(hashlib.sha256(data).hexdigest() for data in workbooks)
+            file_names = tuple(f.name for f in workbook_files)
+            comparison = load_workbook_comparison(file_hashes, file_names, workbooks, run_trace)
+            labels = comparison['labels']
+
+            st.subheader(f"🔀 Perbandingan {len(labels)} Workbook")
+            st.caption(" | ".join(f"**{label}**: {name}" for label, name in zip(labels, file_names)))
+
+            divisions = sorted(comparison['summary']['Divisi'].unique())
+            selected_divisions = st.multiselect("Filter Divisi", divisions, default=divisions, key="compare_divisions")
+            summary_df = comparison['summary'][comparison['summary']['Divisi'].isin(selected_divisions)]
+            programs_df = comparison['programs'][comparison['programs']['Divisi'].isin(selected_divisions)]
+
+            col_clusters, col_changed, col_partial = st.columns(3)
+            col_clusters.metric("Cluster", len(summary_df))
+            col_changed.metric("Definisi Berubah", int((summary_df['Definisi Berubah'] == "Ya").sum()))
+            col_partial.metric("Tidak Ada di Semua Workbook", int((summary_df['Status'] != "Ada di semua").sum()))
+
+            tab_summary, tab_programs = st.tabs(["Ringkasan Cluster", "Detail Program"])
+            with tab_summary:
+                st.dataframe(summary_df, use_container_width=True, hide_index=True)
+            with tab_programs:
+                st.dataframe(programs_df, use_container_width=True, hide_index=True)
+
+            st.download_button(
+                label="📥 Download Perbandingan Workbook ke Excel",
+                data=deferred_excel_export(
+                    ('compare', file_hashes, tuple(selected_divisions)),
+                    lambda: {CROSS_SUMMARY_SHEET_NAME: summary_df, CROSS_PROGRAM_SHEET_NAME: programs_df},
+                    run_trace
+                ),
+                file_name=f"Perbandingan_{'_vs_'.join(labels)}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
+        except Exception as e:
+            safe_error = html.escape(str(e))
+            st.error(f"An error occurred while comparing the Excel files: {safe_error}")
 
 # --- FOOTER ---
 st.markdown("---")
@@ -500,4 +876,35 @@ st.markdown(
     </p>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# --- PANEL DIAGNOSTIK (SIDEBAR) ---
+if run_trace.events:
+    st.session_state.last_trace = run_trace
+last_trace = st.session_state.get('last_trace')
+insight_metrics = get_insight_metrics()
+with diagnostics_placeholder.container():
+    with st.expander("🩺 Diagnostik Performa"):
+        if last_trace:
+            trace_totals = last_trace.totals()
+            st.markdown("**Permintaan terakhir (sesi ini)**")
+            st.dataframe(
+                pd.DataFrame(last_trace.snapshot()).drop(columns=['ts', 'session'], errors='ignore'),
+                use_container_width=True, hide_index=True
+            )
+            st.caption(
+                f"{trace_totals['api_calls']} panggilan API | token prompt {trace_totals['prompt_tokens']} | "
+                f"respons {trace_totals['response_tokens']} | total {trace_totals['total_tokens']}"
+            )
+        else:
+            st.caption("Belum ada tahap yang tercatat di sesi ini.")
+        stage_summary = insight_metrics.stage_summary()
+        if stage_summary:
+            st.markdown("**Per tahap (semua sesi, event terbaru)**")
+            st.dataframe(pd.DataFrame(stage_summary), use_container_width=True, hide_index=True)
+        division_summary = insight_metrics.division_summary()
+        if division_summary:
+            st.markdown("**Token & waktu API per divisi**")
+            st.dataframe(pd.DataFrame(division_summary), use_container_width=True, hide_index=True)
+        if insight_metrics.path:
+            st.caption(f"Metrik JSONL: `{insight_metrics.path}`")
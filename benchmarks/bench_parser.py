@@ -0,0 +1,85 @@
+"""
+Micro-benchmark parser output Gemini: regex DOTALL lama vs parser berbasis baris.
+
+Menjalankan kedua parser atas korpus respons di `benchmarks/corpus/*.txt`, ditambah
+respons panjang (korpus digandakan) dan respons rusak (banyak `Program:` tanpa
+`Deskripsi:`) yang memicu backtracking pada regex lama.
+
+    python benchmarks/bench_parser.py [--repeat 20] [--scale 50]
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insight_parser import parse_ai_response, split_sources  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def legacy_parse(ai_text_response: str) -> int:
+    """
+    Parser lama (regex dikompilasi ulang di setiap panggilan, seperti sebelumnya di app_final.py).
+    """
+    content_part = ai_text_response
+    if "\nSumber" in ai_text_response:
+        content_part = ai_text_response.split("\nSumber", 1)[0]
+    elif "Sumber:" in ai_text_response:
+        content_part = ai_text_response.split("Sumber:", 1)[0]
+    pattern = re.compile(
+        r"[•*-]\s*Program:\s*(.*?)" +
+        r"(?:\n\s+[•*-]?\s*Deskripsi:\s*)(.*?)" +
+        r"(?:\n\s+[•*-]?\s*OKR\s*:\s*)(.*?)" +
+        r"(?=\n\s*[•*-]\s*Program:|\Z)",
+        re.DOTALL | re.IGNORECASE
+    )
+    return len(pattern.findall(content_part))
+
+
+def line_parse(ai_text_response: str) -> int:
+    return len(parse_ai_response(ai_text_response)[1])
+
+
+def load_corpus() -> dict:
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            corpus[os.path.basename(path)] = f.read().strip()
+    return corpus
+
+
+def build_cases(corpus: dict, scale: int) -> dict:
+    cases = dict(corpus)
+    programs_only = [split_sources(text)[0] for text in corpus.values()]
+    cases[f"panjang_x{scale}"] = "\n\n".join(programs_only * scale)
+    cases[f"rusak_tanpa_deskripsi_x{scale * 10}"] = "\n".join(
+        f"- Program: Program {i} tanpa deskripsi dan OKR" for i in range(scale * 10)
+    )
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="Jumlah pengulangan per kasus.")
+    parser.add_argument("--scale", type=int, default=50, help="Faktor pembesar untuk kasus panjang/rusak.")
+    args = parser.parse_args()
+
+    cases = build_cases(load_corpus(), args.scale)
+    print(f"{'kasus':<34}{'KB':>8}{'item lama':>11}{'item baru':>11}{'regex ms':>11}{'baris ms':>11}{'speedup':>9}")
+    for name, text in cases.items():
+        legacy_items = legacy_parse(text)
+        new_items = line_parse(text)
+        legacy_ms = min(timeit.repeat(lambda: legacy_parse(text), number=1, repeat=args.repeat)) * 1000
+        new_ms = min(timeit.repeat(lambda: line_parse(text), number=1, repeat=args.repeat)) * 1000
+        print(
+            f"{name:<34}{len(text) / 1024:>8.1f}{legacy_items:>11}{new_items:>11}"
+            f"{legacy_ms:>11.3f}{new_ms:>11.3f}{legacy_ms / max(new_ms, 1e-9):>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
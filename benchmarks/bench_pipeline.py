@@ -0,0 +1,273 @@
+"""
+Benchmark offline pipeline insight: workbook sintetis + Gemini tiruan (tanpa kuota API).
+
+Mengukur p50/p95 dan memori puncak per tahap: load workbook, parsing sheet CLUSTER,
+ekstraksi program existing, parsing respons AI, kemiripan AI vs existing (gunakan
+`--programs 300` untuk cluster besar), `to_excel`, serta waktu end-to-end
+per cluster dan throughput mode batch.
+
+    python benchmarks/bench_pipeline.py [--divisions 11 --clusters 12 --programs 20]
+        [--latency-ms 800 --jitter-ms 300 --error-rate 0.05] [--repeat 5]
+        [--save hasil.json] [--compare baseline.json --tolerance 0.25]
+
+Dengan `--compare`, skrip keluar dengan status 1 jika p95 atau memori puncak sebuah
+tahap memburuk lebih dari `--tolerance` dibanding baseline (untuk cek sebelum deploy).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini import FakeGeminiClient, load_recorded_responses  # noqa: E402
+from synthetic_workbook import build_synthetic_workbook  # noqa: E402
+from gemini_scheduler import GeminiCallScheduler  # noqa: E402
+from insight_cache import InsightCache  # noqa: E402
+from insight_parser import parse_ai_response  # noqa: E402
+from insight_pipeline import (  # noqa: E402
+    GEMINI_MODEL_NAME,
+    OUTPUT_MODE_JSON,
+    OUTPUT_MODE_TEXT,
+    build_batch_comparison_df,
+    build_comparison_df,
+    build_workbook_cluster_index,
+    build_workbook_program_index,
+    collect_cluster_jobs,
+    get_existing_programs,
+    match_ai_programs,
+    read_workbook_sheets,
+    run_insight_batch,
+    scheduled_strategic_insight,
+    to_excel,
+)
+
+# Ambang noise: tahap yang lebih cepat dari ini tidak dianggap regresi.
+MIN_REGRESSION_MS = 1.0
+MIN_REGRESSION_MB = 0.5
+
+
+def measure(fn, repeat: int) -> dict:
+    """
+    Menjalankan `fn` sebanyak `repeat` kali untuk waktu, lalu sekali lagi di bawah
+    tracemalloc untuk memori puncak (dipisah agar tracing tidak memperlambat timing).
+
+    Returns:
+        (dict): 'samples_ms' dan 'peak_mb'.
+    """
+    samples = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started_at) * 1000)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'samples_ms': samples, 'peak_mb': peak / (1024 * 1024)}
+
+
+def measure_each(fn, items: list) -> dict:
+    """
+    Seperti `measure`, tetapi satu sampel per item (mis. per cluster atau per respons);
+    memori puncak diambil dari item terbesar yang diukur.
+    """
+    samples = []
+    peak = 0
+    for item in items:
+        started_at = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - started_at) * 1000)
+    for item in items[:20]:
+        tracemalloc.start()
+        try:
+            fn(item)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    return {'samples_ms': samples, 'peak_mb': peak / (1024 * 1024)}
+
+
+def summarize(measurement: dict) -> dict:
+    samples = np.asarray(measurement['samples_ms'])
+    return {
+        'n': int(samples.size),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'peak_mb': float(measurement['peak_mb']),
+    }
+
+
+def make_scheduler(workers: int) -> GeminiCallScheduler:
+    # Kuota tinggi dan backoff pendek: yang diukur overhead aplikasi + latensi tiruan,
+    # bukan rate limit.
+    return GeminiCallScheduler(
+        requests_per_minute=1_000_000,
+        tokens_per_minute=1_000_000_000,
+        max_concurrent_calls=workers,
+        max_queue_size=max(32, workers * 4),
+        base_backoff_seconds=0.01,
+        max_backoff_seconds=0.05,
+    )
+
+
+def run_benchmarks(args) -> dict:
+    excel_data = build_synthetic_workbook(args.divisions, args.clusters, args.programs, args.seed)
+    client = FakeGeminiClient(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    output_mode = OUTPUT_MODE_JSON if args.output_mode == "json" else OUTPUT_MODE_TEXT
+
+    sheets = read_workbook_sheets(excel_data)
+    cluster_index = build_workbook_cluster_index(sheets)
+    program_index = build_workbook_program_index(sheets)
+    jobs, _ = collect_cluster_jobs(program_index, cluster_index)
+    sample_jobs = jobs[:args.max_clusters]
+    responses = load_recorded_responses()
+
+    results = {}
+    results['workbook_load'] = measure(lambda: read_workbook_sheets(excel_data), args.repeat)
+    results['cluster_sheet_parse'] = measure(lambda: build_workbook_cluster_index(sheets), args.repeat)
+    results['program_index'] = measure(lambda: build_workbook_program_index(sheets), args.repeat)
+    results['existing_programs'] = measure_each(
+        lambda job: get_existing_programs(program_index[job['divisi']], job['cluster']), jobs
+    )
+    results['response_parse'] = measure_each(parse_ai_response, responses * args.repeat)
+    ai_data_lists = [parse_ai_response(text)[1] for text in responses]
+    similarity_inputs = [
+        (get_existing_programs(program_index[job['divisi']], job['cluster'])[1], ai_data_lists[i % len(ai_data_lists)])
+        for i, job in enumerate(sample_jobs)
+    ]
+    results['similarity'] = measure_each(lambda pair: match_ai_programs(*pair), similarity_inputs)
+
+    def end_to_end(job):
+        # Satu cluster di mode tunggal: existing + panggilan Gemini + parsing + tabel ekspor.
+        _, existing_data_list = get_existing_programs(program_index[job['divisi']], job['cluster'])
+        text = scheduled_strategic_insight(
+            scheduler, client, job['divisi'], job['cluster'], job['cluster_definition'],
+            GEMINI_MODEL_NAME, output_mode
+        )
+        _, ai_data_list, _, _ = parse_ai_response(text)
+        return build_comparison_df(existing_data_list, ai_data_list)
+
+    scheduler = make_scheduler(args.workers)
+    results['cluster_end_to_end'] = measure_each(end_to_end, sample_jobs)
+
+    batch_results = []
+
+    def batch():
+        batch_results[:] = run_insight_batch(
+            sample_jobs, client, InsightCache(":memory:"), make_scheduler(args.workers),
+            model_name=GEMINI_MODEL_NAME,
+            use_caching=False,
+            max_workers=args.workers,
+            output_mode=output_mode
+        )
+
+    results['batch'] = measure(batch, 1)
+    comparison_df = build_batch_comparison_df(batch_results, program_index)
+    results['to_excel'] = measure(lambda: to_excel(comparison_df), args.repeat)
+
+    summary = {name: summarize(measurement) for name, measurement in results.items()}
+    batch_seconds = summary['batch']['p50_ms'] / 1000
+    summary['batch']['clusters_per_second'] = len(sample_jobs) / batch_seconds if batch_seconds else 0.0
+    summary['batch']['errors'] = sum(1 for result in batch_results if result['error'])
+    summary['_meta'] = {
+        'divisions': args.divisions,
+        'clusters': args.clusters,
+        'programs': args.programs,
+        'workbook_kb': len(excel_data) / 1024,
+        'jobs': len(jobs),
+        'benchmarked_clusters': len(sample_jobs),
+        'export_rows': len(comparison_df),
+        'latency_ms': args.latency_ms,
+        'error_rate': args.error_rate,
+        'workers': args.workers,
+        'fake_calls': client.calls,
+        'fake_errors': client.errors,
+    }
+    return summary
+
+
+def print_summary(summary: dict):
+    meta = summary['_meta']
+    print(
+        f"Workbook {meta['divisions']}x{meta['clusters']}x{meta['programs']} ({meta['workbook_kb']:.0f} KB, "
+        f"{meta['jobs']} cluster) | Gemini tiruan {meta['latency_ms']:.0f} ms, error {meta['error_rate']:.0%}, "
+        f"{meta['workers']} worker | {meta['fake_calls']} panggilan, {meta['fake_errors']} error disimulasikan"
+    )
+    print(f"{'tahap':<22}{'n':>6}{'p50 ms':>12}{'p95 ms':>12}{'peak MB':>10}")
+    for name, stats in summary.items():
+        if name.startswith('_'):
+            continue
+        print(f"{name:<22}{stats['n']:>6}{stats['p50_ms']:>12.2f}{stats['p95_ms']:>12.2f}{stats['peak_mb']:>10.2f}")
+    batch = summary['batch']
+    print(
+        f"batch: {meta['benchmarked_clusters']} cluster, {batch['clusters_per_second']:.1f} cluster/detik, "
+        f"{batch['errors']} gagal setelah retry"
+    )
+
+
+def find_regressions(summary: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Returns:
+        (list): Pesan untuk setiap tahap yang p95 atau memori puncaknya memburuk
+            lebih dari `tolerance` (rasio) dibanding baseline.
+    """
+    regressions = []
+    for name, stats in summary.items():
+        previous = baseline.get(name)
+        if name.startswith('_') or not previous:
+            continue
+        if stats['p95_ms'] > previous['p95_ms'] * (1 + tolerance) and stats['p95_ms'] - previous['p95_ms'] > MIN_REGRESSION_MS:
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms")
+        if stats['peak_mb'] > previous['peak_mb'] * (1 + tolerance) and stats['peak_mb'] - previous['peak_mb'] > MIN_REGRESSION_MB:
+            regressions.append(f"{name}: peak {previous['peak_mb']:.2f} -> {stats['peak_mb']:.2f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--divisions", type=int, default=11, help="Jumlah sheet divisi (N).")
+    parser.add_argument("--clusters", type=int, default=12, help="Jumlah cluster per divisi (M).")
+    parser.add_argument("--programs", type=int, default=20, help="Jumlah program per cluster (K).")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latensi tiruan per panggilan Gemini.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variasi acak latensi (+/-).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Rasio panggilan yang gagal 429/503.")
+    parser.add_argument("--workers", type=int, default=4, help="Jumlah panggilan Gemini paralel (mode batch).")
+    parser.add_argument("--output-mode", choices=["text", "json"], default="text")
+    parser.add_argument("--max-clusters", type=int, default=50, help="Batas cluster untuk tahap end-to-end dan batch.")
+    parser.add_argument("--repeat", type=int, default=5, help="Pengulangan untuk tahap per workbook.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Simpan ringkasan ke file JSON (baseline).")
+    parser.add_argument("--compare", help="Bandingkan dengan baseline JSON dari --save.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Toleransi regresi (rasio) untuk --compare.")
+    args = parser.parse_args()
+
+    summary = run_benchmarks(args)
+    print_summary(summary)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = find_regressions(summary, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESI {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
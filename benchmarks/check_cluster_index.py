@@ -0,0 +1,129 @@
+"""
+Cek kesetaraan indeks definisi cluster: parser sheet CLUSTER lama (iterrows per divisi)
+vs `build_cluster_definition_index` (satu pass vektor), atas sheet CLUSTER acak.
+
+Sheet acak mencampur judul divisi (huruf besar/kecil), baris kosong, 'desc', 'nan',
+angka, spasi di tepi teks, dan sheet satu kolom. Skrip keluar dengan status 1 jika ada
+hasil yang berbeda, lalu mencetak waktu kedua parser untuk sheet CLUSTER besar.
+
+    python benchmarks/check_cluster_index.py [--trials 300 --seed 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insight_pipeline import SHEET_TO_DIVISION_MAP, build_cluster_definition_index, division_key  # noqa: E402
+
+SHEET_NAMES = [name.title() for name in SHEET_TO_DIVISION_MAP] + ['Logistics', 'Operation ']
+DIVISION_NAMES = list(SHEET_TO_DIVISION_MAP.values()) + ['Logistics']
+COLUMN_A_VALUES = (
+    DIVISION_NAMES + [name.upper() for name in DIVISION_NAMES]
+    + ['cluster', 'Cluster', 'nan', None, '', ' ', 'c1', 'c2', 'C3', ' c4 ', 1.5]
+)
+COLUMN_B_VALUES = [None, '', 'desc', 'Desc', 'd1', 'd2', 'nan', 'x', 3]
+
+
+def legacy_parse_cluster_definitions(df_cluster_def, sheet_name: str) -> dict:
+    """
+    Parser lama (seperti sebelumnya di app_final.py): cari baris judul divisi, lalu
+    baca baris demi baris hingga baris kosong atau judul divisi lain.
+    """
+    temp_cluster_dict = {}
+    start_index = -1
+    division_target = SHEET_TO_DIVISION_MAP.get(sheet_name.strip().lower(), sheet_name.strip().lower())
+    all_division_names_lower = [v.lower() for v in SHEET_TO_DIVISION_MAP.values()]
+
+    for index, row in df_cluster_def.iterrows():
+        col_a_raw = str(row.iloc[0]).strip() if len(row) > 0 else ""
+        if col_a_raw.lower() == division_target:
+            start_index = index
+            break
+
+    if start_index != -1:
+        for index in range(start_index + 1, len(df_cluster_def)):
+            row = df_cluster_def.iloc[index]
+            col_a_raw = str(row.iloc[0]).strip() if len(row) > 0 and not pd.isna(row.iloc[0]) else ""
+            col_b_raw = str(row.iloc[1]).strip() if len(row) > 1 and not pd.isna(row.iloc[1]) else ""
+            col_a_lower = col_a_raw.lower()
+            is_empty_row = not col_a_raw and not col_b_raw
+            is_other_division_header = col_a_lower in all_division_names_lower and col_a_lower != division_target and (not col_b_raw or col_b_raw.lower() == 'desc')
+            if is_empty_row or is_other_division_header:
+                break
+            if col_a_lower not in ['', 'cluster', 'nan'] and col_b_raw.lower() not in ['', 'desc', 'nan']:
+                temp_cluster_dict[col_a_raw] = col_b_raw
+    return temp_cluster_dict
+
+
+def division_targets() -> list:
+    # Sama seperti `build_workbook_cluster_index` untuk workbook berisi SHEET_NAMES.
+    targets = {v.lower() for v in SHEET_TO_DIVISION_MAP.values()}
+    targets.update(division_key(name) for name in SHEET_NAMES)
+    return sorted(targets)
+
+
+def random_cluster_sheet(rng: random.Random):
+    rows = rng.randint(0, 40)
+    df = pd.DataFrame([[rng.choice(COLUMN_A_VALUES), rng.choice(COLUMN_B_VALUES)] for _ in range(rows)])
+    if rows and rng.random() < 0.1:
+        df = df.iloc[:, :1]
+    return df
+
+
+def check_equivalence(trials: int, seed: int) -> list:
+    """
+    Returns:
+        (list): Pesan untuk setiap (sheet acak, nama sheet) yang hasilnya berbeda.
+    """
+    rng = random.Random(seed)
+    targets = division_targets()
+    mismatches = []
+    for trial in range(trials):
+        df = random_cluster_sheet(rng)
+        index = build_cluster_definition_index(df, targets)
+        for sheet_name in SHEET_NAMES:
+            expected = legacy_parse_cluster_definitions(df, sheet_name)
+            actual = index[division_key(sheet_name)]
+            if expected != actual:
+                mismatches.append(f"percobaan {trial}, sheet '{sheet_name}': lama {expected} != baru {actual}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trials", type=int, default=300, help="Jumlah sheet CLUSTER acak.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clusters", type=int, default=500, help="Cluster per divisi untuk pengukuran waktu.")
+    args = parser.parse_args()
+
+    mismatches = check_equivalence(args.trials, args.seed)
+    for message in mismatches[:20]:
+        print(f"BERBEDA {message}")
+    print(f"{args.trials} sheet acak x {len(SHEET_NAMES)} sheet divisi: {len(mismatches)} perbedaan")
+
+    rows = []
+    for divisi in DIVISION_NAMES:
+        rows.append([divisi, 'Desc'])
+        rows += [[f'c{i}', f'def {i}'] for i in range(args.clusters)]
+        rows.append([None, None])
+    df = pd.DataFrame(rows)
+    started_at = time.perf_counter()
+    for sheet_name in SHEET_NAMES:
+        legacy_parse_cluster_definitions(df, sheet_name)
+    legacy_ms = (time.perf_counter() - started_at) * 1000
+    started_at = time.perf_counter()
+    build_cluster_definition_index(df, division_targets())
+    index_ms = (time.perf_counter() - started_at) * 1000
+    print(f"{len(df)} baris CLUSTER: lama {legacy_ms:.1f} ms ({len(SHEET_NAMES)} sheet), indeks {index_ms:.1f} ms (semua divisi)")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Cek kesetaraan indeks program existing: filter + iterrows lama per cluster vs
+`build_sheet_program_index` (satu pass per sheet), atas sheet divisi acak.
+
+Sheet acak mencampur NaN, string kosong/spasi, angka, 'Cluster'/'nan', dan cluster
+khusus logistik (sheet Operation). Indeks yang dibangun bertahap per potongan data
+(`SheetProgramIndexBuilder.add`, seperti chunk CSV) juga dibandingkan dengan indeks
+sekali jalan. Skrip keluar dengan status 1 jika ada hasil yang berbeda, lalu mencetak
+waktu lookup per cluster kedua cara untuk sheet besar.
+
+    python benchmarks/check_program_index.py [--trials 300 --seed 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insight_pipeline import (  # noqa: E402
+    LOGISTICS_ONLY_CLUSTERS,
+    SheetProgramIndexBuilder,
+    build_sheet_program_index,
+    get_existing_programs,
+)
+
+CLUSTER_VALUES = [None, np.nan, '', '  ', 'A', ' A ', 'B', 'Cluster', 'nan', 'Inventory & Stock Management', 3, 2.5]
+PROGRAM_VALUES = [None, np.nan, '', ' ', 'P1', 'P2 ', 7, 1.5]
+DESCRIPTION_VALUES = [None, np.nan, '', 'D', ' D2 ', 4]
+SHEET_NAMES = ['Operation', 'Information Technology']
+
+
+def legacy_available_clusters(df, sheet_name: str) -> list:
+    """
+    Daftar cluster lama (unique() pada setiap rerun, seperti sebelumnya di app_final.py).
+    """
+    all_clusters_unique = df['Cluster'].dropna().astype(str).str.strip().unique().tolist()
+    all_clusters_in_sheet = [c for c in all_clusters_unique if c.lower() not in ['cluster', 'nan']]
+    if sheet_name.strip().lower() == "operation":
+        return sorted([c for c in all_clusters_in_sheet if c not in LOGISTICS_ONLY_CLUSTERS])
+    return sorted(all_clusters_in_sheet)
+
+
+def legacy_existing_programs(df, cluster: str):
+    """
+    Program existing lama: filter boolean + iterrows untuk satu cluster.
+    """
+    existing_df = df[df['Cluster'].astype(str).str.strip() == cluster][['Program Kerja', 'Deskripsi']]
+    existing_markdown_items = []
+    existing_data_list = []
+    for _, row in existing_df.iterrows():
+        program = row['Program Kerja']
+        deskripsi = row['Deskripsi']
+        if pd.notna(program) and str(program).strip():
+            item_string = f"**Program:** {program}  \n"
+            if pd.notna(deskripsi) and str(deskripsi).strip():
+                item_string += f"**Deskripsi:** {deskripsi}"
+            existing_markdown_items.append(item_string)
+            existing_data_list.append({'program': program, 'deskripsi': deskripsi})
+    return existing_markdown_items, existing_data_list
+
+
+def same_value(a, b) -> bool:
+    if pd.api.types.is_scalar(a) and pd.isna(a):
+        return pd.api.types.is_scalar(b) and pd.isna(b)
+    return a == b
+
+
+def same_programs(expected: tuple, actual: tuple) -> bool:
+    expected_markdown, expected_data = expected
+    actual_markdown, actual_data = actual
+    return expected_markdown == actual_markdown and len(expected_data) == len(actual_data) and all(
+        same_value(x['program'], y['program']) and same_value(x['deskripsi'], y['deskripsi'])
+        for x, y in zip(expected_data, actual_data)
+    )
+
+
+def random_sheet(rng: random.Random, rows: int):
+    return pd.DataFrame({
+        'Cluster': [rng.choice(CLUSTER_VALUES) for _ in range(rows)],
+        'Program Kerja': [rng.choice(PROGRAM_VALUES) for _ in range(rows)],
+        'Deskripsi': [rng.choice(DESCRIPTION_VALUES) for _ in range(rows)],
+    })
+
+
+def build_in_chunks(df, sheet_name: str, rng: random.Random) -> dict:
+    builder = SheetProgramIndexBuilder(sheet_name)
+    start = 0
+    while start < len(df):
+        stop = start + rng.randint(1, 8)
+        builder.add(df.iloc[start:stop])
+        start = stop
+    return builder.build()
+
+
+def check_equivalence(trials: int, seed: int) -> list:
+    """
+    Returns:
+        (list): Pesan untuk setiap (sheet acak, cluster) yang hasilnya berbeda.
+    """
+    rng = random.Random(seed)
+    mismatches = []
+    for trial in range(trials):
+        df = random_sheet(rng, rng.randint(0, 30))
+        sheet_name = rng.choice(SHEET_NAMES)
+        index = build_sheet_program_index(df, sheet_name)
+        chunked_index = build_in_chunks(df, sheet_name, rng)
+
+        expected_clusters = legacy_available_clusters(df, sheet_name)
+        for label, candidate in (('indeks', index), ('indeks per chunk', chunked_index)):
+            if candidate['clusters'] != expected_clusters:
+                mismatches.append(f"percobaan {trial}, {label}: cluster {candidate['clusters']} != lama {expected_clusters}")
+            for cluster in set(expected_clusters) | {'A', 'B', 'zzz'}:
+                if not same_programs(legacy_existing_programs(df, cluster), get_existing_programs(candidate, cluster)):
+                    mismatches.append(f"percobaan {trial}, {label}: program cluster '{cluster}' berbeda")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trials", type=int, default=300, help="Jumlah sheet divisi acak.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows", type=int, default=5000, help="Jumlah baris sheet untuk pengukuran waktu.")
+    args = parser.parse_args()
+
+    mismatches = check_equivalence(args.trials, args.seed)
+    for message in mismatches[:20]:
+        print(f"BERBEDA {message}")
+    print(f"{args.trials} sheet acak: {len(mismatches)} perbedaan")
+
+    rng = random.Random(args.seed)
+    df = pd.DataFrame({
+        'Cluster': [f"Cluster {rng.randint(0, 49)}" for _ in range(args.rows)],
+        'Program Kerja': [f"Program {i}" for i in range(args.rows)],
+        'Deskripsi': [f"Deskripsi {i}" for i in range(args.rows)],
+    })
+    clusters = legacy_available_clusters(df, SHEET_NAMES[1])
+    started_at = time.perf_counter()
+    for cluster in clusters:
+        legacy_existing_programs(df, cluster)
+    legacy_ms = (time.perf_counter() - started_at) * 1000 / len(clusters)
+    started_at = time.perf_counter()
+    index = build_sheet_program_index(df, SHEET_NAMES[1])
+    build_ms = (time.perf_counter() - started_at) * 1000
+    started_at = time.perf_counter()
+    for cluster in clusters:
+        get_existing_programs(index, cluster)
+    lookup_ms = (time.perf_counter() - started_at) * 1000 / len(clusters)
+    print(
+        f"{args.rows} baris, {len(clusters)} cluster: lama {legacy_ms:.2f} ms/cluster, "
+        f"indeks {build_ms:.1f} ms sekali + {lookup_ms:.4f} ms/cluster"
+    )
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Pengganti lokal `genai.Client` untuk benchmark: memutar ulang respons terekam
+(`benchmarks/corpus/*.txt`) dengan latensi dan tingkat error yang bisa diatur,
+sehingga latensi & throughput aplikasi bisa diukur tanpa memakai kuota API.
+"""
+import glob
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from google.genai import errors
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+STREAM_CHUNK_CHARS = 80
+
+
+def load_recorded_responses(corpus_dir: str = CORPUS_DIR) -> list:
+    """
+    Returns:
+        (list): Teks respons terekam, urut nama file.
+    """
+    responses = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            responses.append(f.read().strip())
+    return responses
+
+
+def to_json_response(text: str) -> str:
+    """
+    Mengubah respons teks terekam menjadi dokumen JSON sesuai INSIGHT_RESPONSE_SCHEMA,
+    untuk permintaan mode JSON.
+    """
+    from insight_parser import parse_ai_response
+
+    _, data_list, sources_part, _ = parse_ai_response(text)
+    sources = [
+        {"nama": line.lstrip("-• ").strip()}
+        for line in sources_part.splitlines()[1:]
+        if line.strip()
+    ]
+    return json.dumps({"programs": data_list, "sumber": sources}, ensure_ascii=False)
+
+
+class _FakeModels:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        text = self._owner._respond(config)
+        return SimpleNamespace(text=text, candidates=None, usage_metadata=None)
+
+    def generate_content_stream(self, model, contents, config=None):
+        text = self._owner._respond(config)
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            yield SimpleNamespace(text=text[start:start + STREAM_CHUNK_CHARS], usage_metadata=None)
+
+    def count_tokens(self, model, contents, config=None):
+        return SimpleNamespace(total_tokens=max(1, len(str(contents)) // 4))
+
+
+class FakeGeminiClient:
+    """
+    Tiruan `genai.Client` dengan `models.generate_content`, `generate_content_stream`,
+    dan `count_tokens`.
+
+    - `latency_ms` (+/- `jitter_ms`) disimulasikan dengan `time.sleep` per panggilan.
+    - `error_rate` dari panggilan gagal dengan `errors.ServerError` 503 atau
+      `errors.ClientError` 429 (bergantian), sama seperti API asli, sehingga jalur
+      retry scheduler ikut terukur.
+    """
+
+    def __init__(
+        self,
+        responses: list = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.responses = responses or load_recorded_responses()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self)
+
+    def _respond(self, config) -> str:
+        with self._lock:
+            self.calls += 1
+            index = self.calls
+            delay_ms = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms))
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        if fail:
+            if index % 2:
+                raise errors.ServerError(503, {"error": {"code": 503, "message": "Simulasi overload", "status": "UNAVAILABLE"}})
+            raise errors.ClientError(429, {"error": {"code": 429, "message": "Simulasi kuota habis", "status": "RESOURCE_EXHAUSTED"}})
+
+        text = self.responses[index % len(self.responses)]
+        if config is not None and getattr(config, "response_mime_type", None) == "application/json":
+            return to_json_response(text)
+        return text
@@ -0,0 +1,98 @@
+"""
+Generator workbook sintetis: N divisi x M cluster x K program, dengan format yang sama
+seperti workbook produksi (satu sheet per divisi + sheet CLUSTER berisi blok definisi).
+
+    python benchmarks/synthetic_workbook.py -o synthetic.xlsx --divisions 11 --clusters 12 --programs 20
+"""
+import argparse
+import os
+import random
+import sys
+from io import BytesIO
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insight_pipeline import SHEET_TO_DIVISION_MAP  # noqa: E402
+
+KNOWN_DIVISION_SHEETS = [name.title() for name in SHEET_TO_DIVISION_MAP]
+
+WORDS = (
+    "digitalisasi toko gerai pelanggan loyalitas stok gudang distribusi supplier margin "
+    "harga promosi aplikasi data analitik otomasi efisiensi layanan audit risiko kepatuhan "
+    "pelatihan karyawan properti ekspansi energi biaya kualitas"
+).split()
+
+
+def division_sheet_names(divisions: int) -> list:
+    """
+    Nama sheet divisi: divisi yang dikenal SHEET_TO_DIVISION_MAP terlebih dahulu,
+    lalu `Divisi 12`, `Divisi 13`, dst.
+    """
+    names = KNOWN_DIVISION_SHEETS[:divisions]
+    names += [f"Divisi {i}" for i in range(len(names) + 1, divisions + 1)]
+    return names
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def build_synthetic_sheets(divisions: int, clusters: int, programs: int, seed: int = 0) -> dict:
+    """
+    Returns:
+        (dict): {nama_sheet: DataFrame}, termasuk sheet 'CLUSTER' (tanpa header).
+    """
+    rng = random.Random(seed)
+    sheets = {}
+    cluster_rows = []
+    for sheet_name in division_sheet_names(divisions):
+        cluster_names = [f"Cluster {sheet_name} {c + 1:02d}" for c in range(clusters)]
+        rows = []
+        for cluster in cluster_names:
+            for p in range(programs):
+                rows.append({
+                    'Cluster': cluster,
+                    'Program Kerja': f"Program {p + 1} {_sentence(rng, 3)}",
+                    'Deskripsi': _sentence(rng, rng.randint(8, 25)) if rng.random() > 0.1 else None,
+                })
+        sheets[sheet_name] = pd.DataFrame(rows, columns=['Cluster', 'Program Kerja', 'Deskripsi'])
+
+        header = "IT" if sheet_name == "Information Technology" else sheet_name
+        cluster_rows.append([header, "Desc"])
+        cluster_rows.extend([cluster, _sentence(rng, rng.randint(10, 30))] for cluster in cluster_names)
+        cluster_rows.append([None, None])
+    sheets['CLUSTER'] = pd.DataFrame(cluster_rows)
+    return sheets
+
+
+def build_synthetic_workbook(divisions: int, clusters: int, programs: int, seed: int = 0) -> bytes:
+    """
+    Returns:
+        (bytes): Isi file .xlsx sintetis.
+    """
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        for sheet_name, df in build_synthetic_sheets(divisions, clusters, programs, seed).items():
+            is_cluster_sheet = sheet_name == 'CLUSTER'
+            df.to_excel(writer, sheet_name=sheet_name, index=False, header=not is_cluster_sheet)
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", default="synthetic_workbook.xlsx", help="File .xlsx keluaran.")
+    parser.add_argument("--divisions", type=int, default=11, help="Jumlah sheet divisi (N).")
+    parser.add_argument("--clusters", type=int, default=12, help="Jumlah cluster per divisi (M).")
+    parser.add_argument("--programs", type=int, default=20, help="Jumlah program per cluster (K).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.output, "wb") as f:
+        f.write(build_synthetic_workbook(args.divisions, args.clusters, args.programs, args.seed))
+    print(f"{args.output}: {args.divisions} divisi x {args.clusters} cluster x {args.programs} program")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+
+# --- Scheduler panggilan Gemini (satu instance per proses) ---
+# Menggabungkan permintaan identik yang sedang berjalan, membatasi laju sesuai kuota
+# RPM/TPM (token bucket), mengulang error 429/5xx dengan exponential backoff + jitter,
+# dan menahan permintaan berlebih di antrian terbatas alih-alih langsung gagal.
+
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 250_000
+DEFAULT_MAX_CONCURRENT_CALLS = 8
+DEFAULT_MAX_QUEUE_SIZE = 32
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 300
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BASE_BACKOFF_SECONDS = 1.0
+DEFAULT_MAX_BACKOFF_SECONDS = 32.0
+
+
+class SchedulerBusyError(Exception):
+    """
+    Dilempar jika antrian panggilan Gemini penuh atau waktu tunggu habis.
+    """
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Perkiraan kasar jumlah token (~4 karakter per token) untuk keperluan rate limit.
+    """
+    return max(1, len(text or "") // 4)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    True untuk error kuota (429) dan error server (5xx) dari API.
+    """
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return False
+    return code == 429 or 500 <= code < 600
+
+
+class TokenBucket:
+    """
+    Token bucket sederhana: terisi `rate_per_minute` unit per menit hingga `capacity`.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._available = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1):
+        """
+        Memblokir hingga `amount` unit tersedia, lalu memakainya.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._available = min(self.capacity, self._available + (now - self._updated_at) * self.rate_per_second)
+                self._updated_at = now
+                if self._available >= amount:
+                    self._available -= amount
+                    return
+                wait_seconds = (amount - self._available) / self.rate_per_second
+            time.sleep(wait_seconds)
+
+
+class GeminiCallScheduler:
+    """
+    Penjadwal panggilan Gemini untuk seluruh proses server.
+
+    - `call()` menggabungkan permintaan dengan `key` yang sama: hanya satu panggilan API
+      yang berjalan, pemanggil lain menunggu Future yang sama.
+    - `slot()` menahan pemanggil di antrian terbatas hingga slot konkurensi tersedia,
+      lalu memakai kuota RPM/TPM dari token bucket.
+    - Error 429/5xx diulang dengan exponential backoff + full jitter.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        max_concurrent_calls: int = DEFAULT_MAX_CONCURRENT_CALLS,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        queue_timeout_seconds: float = DEFAULT_QUEUE_TIMEOUT_SECONDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_backoff_seconds: float = DEFAULT_BASE_BACKOFF_SECONDS,
+        max_backoff_seconds: float = DEFAULT_MAX_BACKOFF_SECONDS,
+    ):
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.queue_timeout_seconds = queue_timeout_seconds
+
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._call_slots = threading.BoundedSemaphore(max_concurrent_calls)
+        self._queue_slots = threading.BoundedSemaphore(max_queue_size)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.rejected = 0
+        self.waiting = 0
+
+    def claim(self, key: str):
+        """
+        Mendaftarkan permintaan `key` sebagai in-flight.
+
+        Returns:
+            (tuple): (future, is_owner). Jika `is_owner` True, pemanggil wajib mengisi
+                future lewat `set_result` / `set_exception`; jika False, cukup tunggu
+                hasil permintaan identik yang sedang berjalan lewat `wait(future)`.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._release(key, future))
+        return future, True
+
+    def wait(self, future: Future):
+        """
+        Menunggu hasil permintaan identik yang sedang berjalan, paling lama
+        `queue_timeout_seconds` (pemilik yang macet tidak menahan pemanggil lain selamanya).
+        """
+        try:
+            return future.result(timeout=self.queue_timeout_seconds)
+        except FutureTimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise SchedulerBusyError("Waktu tunggu permintaan identik yang sedang berjalan habis. Silakan coba lagi.")
+
+    def fail(self, future: Future, error: BaseException):
+        """
+        Menandai permintaan in-flight gagal. Pembatalan non-Exception (mis. rerun/stop
+        skrip Streamlit) tidak diteruskan apa adanya ke pemanggil lain yang menunggu.
+        """
+        if not isinstance(error, Exception):
+            error = SchedulerBusyError("Permintaan identik yang sedang berjalan dibatalkan. Silakan coba lagi.")
+        future.set_exception(error)
+
+    def _release(self, key: str, future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0):
+        """
+        Menunggu di antrian terbatas hingga slot konkurensi tersedia, lalu memakai
+        kuota request dan token dari token bucket selama blok `with` berjalan.
+        """
+        if not self._queue_slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise SchedulerBusyError("Antrian panggilan Gemini sedang penuh. Silakan coba lagi beberapa saat lagi.")
+        with self._lock:
+            self.waiting += 1
+        try:
+            acquired = self._call_slots.acquire(timeout=self.queue_timeout_seconds)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+            self._queue_slots.release()
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise SchedulerBusyError("Waktu tunggu antrian panggilan Gemini habis. Silakan coba lagi.")
+        try:
+            self._request_bucket.acquire(1)
+            if estimated_tokens:
+                self._token_bucket.acquire(estimated_tokens)
+            with self._lock:
+                self.calls += 1
+            yield
+        finally:
+            self._call_slots.release()
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        return attempt < self.max_retries and is_retryable_error(error)
+
+    def backoff(self, attempt: int):
+        """
+        Tidur selama exponential backoff dengan full jitter untuk percobaan ke-`attempt`.
+        """
+        with self._lock:
+            self.retries += 1
+        delay = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt))
+        time.sleep(random.uniform(0, delay))
+
+    def run(self, fn, *args, estimated_tokens: int = 0, **kwargs):
+        """
+        Menjalankan `fn` lewat antrian dan rate limiter, dengan retry untuk 429/5xx.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.slot(estimated_tokens):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                self.backoff(attempt)
+                attempt += 1
+
+    def call(self, key: str, fn, *args, estimated_tokens: int = 0, **kwargs):
+        """
+        Seperti `run`, tetapi permintaan identik (`key` sama) yang datang bersamaan
+        berbagi satu panggilan API dan satu hasil.
+        """
+        future, is_owner = self.claim(key)
+        if not is_owner:
+            return self.wait(future)
+        try:
+            result = self.run(fn, *args, estimated_tokens=estimated_tokens, **kwargs)
+        except BaseException as e:
+            self.fail(future, e)
+            raise
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            (dict): Jumlah panggilan, permintaan yang digabung, retry, penolakan, dan antrian saat ini.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "waiting": self.waiting,
+                "inflight": len(self._inflight),
+            }
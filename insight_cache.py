@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# --- Cache insight Gemini lintas sesi (SQLite) ---
+# Dipakai bersama oleh semua sesi Streamlit (dan proses lain) di server yang sama,
+# sehingga cluster yang sama tidak memicu panggilan Gemini berulang.
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "insight_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 2000
+
+
+def hash_text(text: str) -> str:
+    """
+    Menghasilkan hash SHA-256 (hex penuh) dari sebuah teks.
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def make_cache_key(model_name: str, system_prompt: str, user_prompt: str, definition_hash: str, options: dict = None) -> str:
+    """
+    Membuat kunci cache dari prompt lengkap, nama model, hash definisi cluster, dan
+    opsi lain yang memengaruhi prompt akhir (mis. anggaran token).
+    """
+    fields = {
+        "model": model_name,
+        "system_prompt": system_prompt,
+        "user_prompt": user_prompt,
+        "definition_hash": definition_hash,
+    }
+    if options:
+        fields["options"] = options
+    payload = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+    return hash_text(payload)
+
+
+class InsightCache:
+    """
+    Penyimpanan hasil insight berbasis SQLite dengan TTL dan batas jumlah entri.
+
+    Entri yang kedaluwarsa (lebih tua dari `ttl_seconds`) dianggap miss dan dihapus.
+    Jika jumlah entri melebihi `max_entries`, entri yang paling lama tidak diakses
+    akan dihapus terlebih dahulu (LRU). Counter hit/miss dihitung per proses.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS insights (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    model TEXT,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_insights_accessed ON insights (accessed_at)")
+            self._conn.commit()
+
+    def get(self, key: str):
+        """
+        Mengambil hasil dari cache.
+
+        Returns:
+            (str): Hasil yang tersimpan (atau None jika tidak ada / kedaluwarsa).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM insights WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM insights WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE insights SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str, model_name: str = None):
+        """
+        Menyimpan hasil ke cache, lalu menjalankan eviksi TTL dan batas ukuran.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO insights (key, value, model, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, model_name, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM insights WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries:
+            self._conn.execute(
+                """
+                DELETE FROM insights WHERE key IN (
+                    SELECT key FROM insights ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        """
+        Menghapus seluruh entri cache.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM insights")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            (dict): Jumlah hit, miss, dan entri yang tersimpan saat ini.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
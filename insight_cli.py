@@ -0,0 +1,184 @@
+"""
+Menjalankan analisis insight untuk seluruh cluster sebuah workbook tanpa UI Streamlit,
+mis. sebagai job batch malam hari yang sekaligus mengisi cache insight bersama.
+
+    python insight_cli.py Measurement.xlsx -o Analisis_Semua_Divisi.xlsx
+    python insight_cli.py Measurement.xlsx --sheet Operation --sheet Logistic --workers 6
+    python insight_cli.py program_kerja.csv --clusters definisi_cluster.csv --division-column Divisi
+    python insight_cli.py Measurement_rev2.xlsx --incremental
+
+API key dibaca dari environment `MY_API_KEY` / `GEMINI_API_KEY`, atau dari
+`.streamlit/secrets.toml` (kunci `MY_API_KEY`) seperti aplikasi Streamlit.
+"""
+import argparse
+import os
+import sys
+import time
+
+from google import genai
+
+from insight_manifest import CHANGE_LABELS, CHANGE_UNCHANGED
+from insight_metrics import RunTrace
+from insight_pipeline import (
+    BATCH_DEFAULT_CONCURRENCY,
+    CSV_DIVISION_COLUMNS,
+    GEMINI_MODEL_NAME,
+    OUTPUT_MODE_JSON,
+    OUTPUT_MODE_TEXT,
+    build_csv_cluster_index,
+    build_csv_program_index,
+    build_workbook_cluster_index,
+    build_workbook_program_index,
+    create_gemini_scheduler,
+    create_insight_cache,
+    create_insight_manifest,
+    create_insight_metrics,
+    find_csv_column,
+    get_division_sheet_names,
+    read_csv_columns,
+    read_workbook_sheets,
+    run_incremental_insights,
+    run_index_insights,
+    to_excel,
+)
+
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+
+
+def load_api_key() -> str:
+    """
+    Mengambil API key Gemini dari environment, lalu dari secrets Streamlit.
+
+    Returns:
+        (str): API key (atau None jika tidak ditemukan).
+    """
+    api_key = os.environ.get("MY_API_KEY") or os.environ.get("GEMINI_API_KEY")
+    if api_key or not os.path.exists(SECRETS_PATH):
+        return api_key
+    import tomllib
+    with open(SECRETS_PATH, "rb") as f:
+        return tomllib.load(f).get("MY_API_KEY")
+
+
+def default_output_path(workbook_path: str) -> str:
+    name = os.path.splitext(os.path.basename(workbook_path))[0]
+    return f"Analisis_Batch_{name}.xlsx"
+
+
+def report_unknown_sheets(requested: list, available: list, label: str) -> bool:
+    """
+    Mencetak pesan jika ada `--sheet` yang tidak ada di input.
+
+    Returns:
+        (bool): True jika semua sheet yang diminta tersedia.
+    """
+    unknown = [name for name in requested or [] if name not in available]
+    if unknown:
+        print(f"{label} tidak ditemukan: {', '.join(unknown)} (tersedia: {', '.join(available)}).", file=sys.stderr)
+    return not unknown
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("workbook", help="File .xlsx berisi sheet divisi dan sheet CLUSTER, atau file .csv program kerja.")
+    parser.add_argument("-o", "--output", help="File .xlsx hasil perbandingan gabungan (default: Analisis_Batch_<workbook>.xlsx).")
+    parser.add_argument("--sheet", action="append", dest="sheets", help="Sheet divisi yang diproses (bisa diulang; default: semua sheet).")
+    parser.add_argument("--clusters", help="Input .csv: CSV definisi cluster (Divisi, Cluster, Definisi, atau format blok sheet CLUSTER).")
+    parser.add_argument("--division-column", help=f"Input .csv: kolom divisi (default: kolom pertama dari {', '.join(CSV_DIVISION_COLUMNS)}).")
+    parser.add_argument("--workers", type=int, default=BATCH_DEFAULT_CONCURRENCY, help="Jumlah panggilan Gemini paralel.")
+    parser.add_argument("--model", default=GEMINI_MODEL_NAME, help="Nama model Gemini.")
+    parser.add_argument("--output-mode", choices=[OUTPUT_MODE_TEXT, OUTPUT_MODE_JSON], default=OUTPUT_MODE_TEXT, help="Format output AI.")
+    parser.add_argument("--no-cache", action="store_true", help="Abaikan cache yang ada (hasil baru tetap disimpan ke cache).")
+    parser.add_argument("--incremental", action="store_true", help="Hanya analisis ulang cluster yang berubah sejak run terakhir (manifest fingerprint).")
+    args = parser.parse_args(argv)
+
+    api_key = load_api_key()
+    if not api_key:
+        print("API key tidak ditemukan. Set MY_API_KEY atau isi .streamlit/secrets.toml.", file=sys.stderr)
+        return 2
+
+    is_csv = args.workbook.lower().endswith(".csv")
+    if is_csv and not args.clusters:
+        print("Input .csv membutuhkan --clusters (CSV definisi cluster).", file=sys.stderr)
+        return 2
+    if args.incremental and args.no_cache:
+        print("--incremental tidak bisa digabung dengan --no-cache.", file=sys.stderr)
+        return 2
+
+    with open(args.workbook, "rb") as f:
+        input_data = f.read()
+
+    started_at = time.perf_counter()
+    trace = RunTrace(create_insight_metrics(), source="cli", workbook=os.path.basename(args.workbook))
+
+    def report(result):
+        status = result['status'] if not result['error'] else f"error: {result['error']}"
+        print(f"[{status}] {result['divisi']} / {result['cluster']}", file=sys.stderr)
+
+    if is_csv:
+        division_column = args.division_column or find_csv_column(read_csv_columns(input_data), CSV_DIVISION_COLUMNS)
+        if not division_column:
+            print(f"Kolom divisi tidak ditemukan ({', '.join(CSV_DIVISION_COLUMNS)}); gunakan --division-column.", file=sys.stderr)
+            return 2
+        with open(args.clusters, "rb") as f:
+            cluster_data = f.read()
+        program_index = build_csv_program_index(input_data, division_column, trace=trace)
+        if not report_unknown_sheets(args.sheets, list(program_index), "Divisi"):
+            return 2
+        cluster_index = build_csv_cluster_index(cluster_data, list(program_index), trace=trace)
+    else:
+        sheets = read_workbook_sheets(input_data, trace)
+        if not report_unknown_sheets(args.sheets, get_division_sheet_names(sheets), "Sheet"):
+            return 2
+        cluster_index = build_workbook_cluster_index(sheets, trace)
+        program_index = build_workbook_program_index(sheets, args.sheets, trace)
+
+    run_options = dict(
+        sheet_names=args.sheets,
+        model_name=args.model,
+        output_mode=args.output_mode,
+        max_workers=args.workers,
+        on_result=report,
+        trace=trace
+    )
+    client = genai.Client(api_key=api_key)
+    if args.incremental:
+        run = run_incremental_insights(
+            program_index, cluster_index, client, create_insight_cache(), create_gemini_scheduler(), create_insight_manifest(), **run_options
+        )
+        for item in run['diff']:
+            if item['change'] != CHANGE_UNCHANGED:
+                print(f"[{CHANGE_LABELS[item['change']]}] {item['divisi']} / {item['cluster']}", file=sys.stderr)
+    else:
+        run = run_index_insights(
+            program_index, cluster_index, client, create_insight_cache(), create_gemini_scheduler(), use_caching=not args.no_cache, **run_options
+        )
+
+    for skipped in run['skipped']:
+        print(f"[dilewati] {skipped} (definisi cluster tidak ditemukan)", file=sys.stderr)
+
+    output_path = args.output or default_output_path(args.workbook)
+    with trace.stage("export", rows=len(run['comparison'])):
+        excel_bytes = to_excel(run['comparison'])
+    with open(output_path, "wb") as f:
+        f.write(excel_bytes)
+
+    results = run['results']
+    failed = sum(1 for result in results if result['error'])
+    from_cache = sum(1 for result in results if result['status'] in ('cache', 'manifest'))
+    totals = trace.totals()
+    print(
+        f"{len(results)} cluster diproses ({from_cache} dari cache, {failed} gagal) "
+        f"dalam {time.perf_counter() - started_at:.1f} detik -> {output_path}",
+        file=sys.stderr
+    )
+    print(
+        f"Token: prompt {totals['prompt_tokens']} | respons {totals['response_tokens']} | total {totals['total_tokens']} "
+        f"({totals['api_calls']} panggilan API)",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from insight_cache import hash_text
+
+
+# --- Manifest fingerprint per divisi & cluster (analisis ulang inkremental) ---
+# Menyimpan fingerprint konten yang terakhir dianalisis untuk setiap (divisi, cluster, mode
+# output): definisi, program existing, dan kunci insight (prompt lengkap + model), beserta
+# hasil insight-nya. Saat revisi workbook diunggah, diff terhadap manifest menentukan cluster
+# mana yang perlu insight baru; sisanya memakai hasil tersimpan. Berbeda dengan cache insight,
+# entri manifest tidak kedaluwarsa dan tidak dievict.
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "insight_manifest.sqlite3")
+
+CHANGE_NEW = "new"
+CHANGE_DEFINITION = "definition"
+CHANGE_PROMPT = "prompt"
+CHANGE_PROGRAMS = "programs"
+CHANGE_UNCHANGED = "unchanged"
+CHANGE_REMOVED = "removed"
+
+# Hanya perubahan yang memengaruhi prompt Gemini yang memicu insight baru. Program existing
+# tidak masuk ke prompt, sehingga perubahannya cukup memperbarui tabel perbandingan.
+REGENERATE_CHANGES = {CHANGE_NEW, CHANGE_DEFINITION, CHANGE_PROMPT}
+
+CHANGE_LABELS = {
+    CHANGE_NEW: "Cluster baru",
+    CHANGE_DEFINITION: "Definisi berubah",
+    CHANGE_PROMPT: "Prompt / model berubah",
+    CHANGE_PROGRAMS: "Program existing berubah",
+    CHANGE_UNCHANGED: "Tidak berubah",
+    CHANGE_REMOVED: "Tidak ada lagi di workbook",
+}
+
+
+def _clean(value) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value).strip()
+
+
+def programs_fingerprint(existing_data_list: list) -> str:
+    """
+    Fingerprint program existing sebuah cluster (nama + deskripsi; urutan baris dan
+    spasi di tepi teks tidak berpengaruh).
+    """
+    items = sorted([_clean(item['program']), _clean(item['deskripsi'])] for item in existing_data_list)
+    return hash_text(json.dumps(items, ensure_ascii=False))
+
+
+class InsightManifest:
+    """
+    Penyimpanan manifest berbasis SQLite (aman dipakai bersama beberapa thread dan proses).
+
+    Setiap entri dikunci oleh (division_key, cluster, output_mode) dengan field fingerprint
+    'definition_hash', 'programs_hash', 'insight_key', serta 'insight' (teks hasil terakhir).
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS manifest (
+                    division_key TEXT NOT NULL,
+                    cluster TEXT NOT NULL,
+                    output_mode TEXT NOT NULL,
+                    divisi TEXT NOT NULL,
+                    definition_hash TEXT NOT NULL,
+                    programs_hash TEXT NOT NULL,
+                    insight_key TEXT NOT NULL,
+                    model TEXT,
+                    insight TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (division_key, cluster, output_mode)
+                )
+                """
+            )
+            self._conn.commit()
+
+    def entries(self, output_mode: str, division_keys: list = None) -> dict:
+        """
+        Returns:
+            (dict): {(division_key, cluster): entri} untuk `output_mode`, dibatasi ke
+                `division_keys` jika diisi.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT division_key, cluster, divisi, definition_hash, programs_hash, insight_key, model, insight, updated_at
+                FROM manifest WHERE output_mode = ?
+                """,
+                (output_mode,),
+            ).fetchall()
+        allowed = set(division_keys) if division_keys is not None else None
+        stored = {}
+        for division_key, cluster, divisi, definition_hash, programs_hash, insight_key, model, insight, updated_at in rows:
+            if allowed is None or division_key in allowed:
+                stored[(division_key, cluster)] = {
+                    'division_key': division_key,
+                    'cluster': cluster,
+                    'divisi': divisi,
+                    'definition_hash': definition_hash,
+                    'programs_hash': programs_hash,
+                    'insight_key': insight_key,
+                    'model': model,
+                    'insight': insight,
+                    'updated_at': updated_at,
+                }
+        return stored
+
+    def diff(self, fingerprints: list, output_mode: str) -> list:
+        """
+        Membandingkan fingerprint revisi baru dengan manifest.
+
+        Args:
+            fingerprints (list): Dict dengan kunci 'division_key', 'divisi', 'cluster',
+                'definition_hash', 'programs_hash', 'insight_key'.
+
+        Returns:
+            (list): Salinan setiap fingerprint dengan 'change' (salah satu CHANGE_*) dan
+                'stored_insight' (hasil tersimpan, atau None), diikuti entri manifest dari
+                divisi yang sama yang tidak ada lagi di revisi baru (CHANGE_REMOVED).
+        """
+        stored = self.entries(output_mode, [item['division_key'] for item in fingerprints])
+        diff = []
+        for item in fingerprints:
+            previous = stored.pop((item['division_key'], item['cluster']), None)
+            if previous is None:
+                change = CHANGE_NEW
+            elif previous['definition_hash'] != item['definition_hash']:
+                change = CHANGE_DEFINITION
+            elif previous['insight_key'] != item['insight_key']:
+                change = CHANGE_PROMPT
+            elif previous['programs_hash'] != item['programs_hash']:
+                change = CHANGE_PROGRAMS
+            else:
+                change = CHANGE_UNCHANGED
+            diff.append(dict(item, change=change, stored_insight=previous['insight'] if previous else None))
+        for previous in stored.values():
+            diff.append({
+                'division_key': previous['division_key'],
+                'divisi': previous['divisi'],
+                'cluster': previous['cluster'],
+                'change': CHANGE_REMOVED,
+                'stored_insight': previous['insight'],
+            })
+        return diff
+
+    def update(self, entries: list, output_mode: str, model_name: str = None):
+        """
+        Menyimpan fingerprint + insight terbaru (entri dengan kunci seperti `diff` plus 'insight').
+        """
+        now = time.time()
+        rows = [
+            (
+                entry['division_key'], entry['cluster'], output_mode, entry['divisi'],
+                entry['definition_hash'], entry['programs_hash'], entry['insight_key'],
+                model_name, entry['insight'], now,
+            )
+            for entry in entries
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO manifest
+                    (division_key, cluster, output_mode, divisi, definition_hash, programs_hash, insight_key, model, insight, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            self._conn.commit()
+
+    def remove(self, keys: list, output_mode: str):
+        """
+        Menghapus entri (division_key, cluster) untuk `output_mode`, mis. cluster yang
+        tidak ada lagi di workbook (CHANGE_REMOVED) agar tidak dilaporkan ulang.
+        """
+        rows = [(division_key, cluster, output_mode) for division_key, cluster in keys]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM manifest WHERE division_key = ? AND cluster = ? AND output_mode = ?",
+                rows,
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """
+        Menghapus seluruh entri manifest.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM manifest")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            (dict): Jumlah entri manifest.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+        return {"entries": entries}
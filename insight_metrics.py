@@ -0,0 +1,197 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# --- Instrumentasi per tahap (waktu, cache hit/miss, pemakaian token) ---
+# Setiap tahap (baca file, parsing sheet, indeks cluster, panggilan API, parsing, ekspor,
+# render) dicatat sebagai satu event JSON: dikirim ke logger `insight_metrics`, ditulis ke
+# file JSONL, dan disimpan di ring buffer untuk panel diagnostik di sidebar.
+
+logger = logging.getLogger("insight_metrics")
+
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "insight_metrics.jsonl")
+DEFAULT_MAX_EVENTS = 1000
+DEFAULT_MAX_FILE_BYTES = 20 * 1024 * 1024
+
+USAGE_FIELDS = {
+    "prompt_token_count": "prompt_tokens",
+    "candidates_token_count": "response_tokens",
+    "cached_content_token_count": "cached_tokens",
+    "thoughts_token_count": "thoughts_tokens",
+    "total_token_count": "total_tokens",
+}
+
+
+def usage_fields(usage_metadata) -> dict:
+    """
+    Mengambil jumlah token dari `response.usage_metadata` Gemini.
+
+    Returns:
+        (dict): Mis. {'prompt_tokens': 812, 'response_tokens': 1450, 'total_tokens': 2262};
+            field yang tidak tersedia dilewati.
+    """
+    if usage_metadata is None:
+        return {}
+    fields = {}
+    for attr, name in USAGE_FIELDS.items():
+        value = getattr(usage_metadata, attr, None)
+        if isinstance(value, int):
+            fields[name] = value
+    return fields
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Persentil nearest-rank (q dalam 0-100) dari daftar angka.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class InsightMetrics:
+    """
+    Penampung event metrik untuk seluruh proses (thread-safe).
+
+    Event terbaru disimpan di ring buffer (`max_events`) untuk ringkasan p50/p95 per tahap;
+    total token dan waktu API per divisi diakumulasi terpisah sejak proses dimulai.
+    Jika `path` diisi, setiap event juga ditambahkan ke file JSONL (diputar ke `.1`
+    setelah melewati `max_file_bytes`).
+    """
+
+    def __init__(self, path: str = DEFAULT_METRICS_PATH, max_events: int = DEFAULT_MAX_EVENTS, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES):
+        self.path = path
+        self.max_file_bytes = max_file_bytes
+        self._events = deque(maxlen=max_events)
+        self._divisions = {}
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def emit(self, event: dict):
+        """
+        Mencatat satu event ke logger, ring buffer, agregat per divisi, dan file metrik.
+        """
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        logger.info(line)
+        with self._lock:
+            self._events.append(event)
+            if event.get("stage") == "api_call":
+                totals = self._divisions.setdefault(
+                    event.get("divisi") or "-",
+                    {"calls": 0, "errors": 0, "api_ms": 0.0, "prompt_tokens": 0, "response_tokens": 0, "total_tokens": 0}
+                )
+                totals["calls"] += 1
+                totals["errors"] += 1 if event.get("error") else 0
+                totals["api_ms"] += event.get("ms", 0.0)
+                for name in ("prompt_tokens", "response_tokens", "total_tokens"):
+                    totals[name] += event.get(name, 0)
+            if self.path:
+                self._write_line(line)
+
+    def _write_line(self, line: str):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_file_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning("Gagal menulis file metrik %s: %s", self.path, e)
+
+    def stage_summary(self) -> list:
+        """
+        Returns:
+            (list): Per tahap: 'stage', 'n', 'p50_ms', 'p95_ms', dan jumlah cache hit/miss
+                (dari event di ring buffer).
+        """
+        with self._lock:
+            events = list(self._events)
+        stages = {}
+        for event in events:
+            stages.setdefault(event["stage"], []).append(event)
+        summary = []
+        for stage, stage_events in stages.items():
+            durations = [event["ms"] for event in stage_events]
+            summary.append({
+                "stage": stage,
+                "n": len(stage_events),
+                "p50_ms": round(percentile(durations, 50), 1),
+                "p95_ms": round(percentile(durations, 95), 1),
+                "cache_hit": sum(1 for event in stage_events if event.get("cache") == "hit"),
+                "cache_miss": sum(1 for event in stage_events if event.get("cache") == "miss"),
+            })
+        return summary
+
+    def division_summary(self) -> list:
+        """
+        Returns:
+            (list): Per divisi: jumlah panggilan API, error, total waktu API, dan total token.
+        """
+        with self._lock:
+            return [{"divisi": divisi, **totals} for divisi, totals in sorted(self._divisions.items())]
+
+
+class RunTrace:
+    """
+    Catatan tahap untuk satu alur kerja (satu rerun Streamlit, satu job CLI).
+
+    Setiap event mendapat `context` (mis. sesi, divisi, cluster) dan diteruskan ke
+    `metrics` (jika ada). Aman dipakai dari beberapa thread (mode batch) dan dari
+    callable download yang dijalankan di luar thread skrip.
+    """
+
+    def __init__(self, metrics: InsightMetrics = None, **context):
+        self.metrics = metrics
+        self.context = context
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float, **fields) -> dict:
+        event = {"ts": round(time.time(), 3), "stage": stage, "ms": round(ms, 2), **self.context, **fields}
+        with self._lock:
+            self.events.append(event)
+        if self.metrics is not None:
+            self.metrics.emit(event)
+        return event
+
+    @contextmanager
+    def stage(self, stage: str, **fields):
+        """
+        Mengukur waktu blok `with`. Dict yang di-yield bisa diisi field tambahan
+        (mis. `cache`, jumlah token); exception dicatat sebagai field `error`.
+        """
+        event_fields = dict(fields)
+        started_at = time.perf_counter()
+        try:
+            yield event_fields
+        except Exception as e:
+            event_fields["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(stage, (time.perf_counter() - started_at) * 1000, **event_fields)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return list(self.events)
+
+    def totals(self) -> dict:
+        """
+        Returns:
+            (dict): Jumlah panggilan API dan total token (tahap bersarang tidak dijumlahkan
+                waktunya agar tidak terhitung ganda).
+        """
+        events = self.snapshot()
+        return {
+            "api_calls": sum(1 for event in events if event["stage"] == "api_call"),
+            "prompt_tokens": sum(event.get("prompt_tokens", 0) for event in events),
+            "response_tokens": sum(event.get("response_tokens", 0) for event in events),
+            "total_tokens": sum(event.get("total_tokens", 0) for event in events),
+        }
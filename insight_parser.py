@@ -0,0 +1,256 @@
+import json
+import re
+
+
+# --- Parser output teks Gemini (satu pass, berbasis baris) ---
+# Setiap baris diperiksa sekali: baris `Program:` membuka item baru, baris `Deskripsi:` /
+# `OKR:` berpindah field, baris lain menjadi lanjutan field yang sedang aktif. Tidak ada
+# regex multi-baris sehingga waktu parsing linear terhadap panjang respons, dan item yang
+# tidak lengkap (mis. tanpa OKR) tetap dipulihkan alih-alih menggagalkan seluruh hasil.
+
+BULLET_CHARS = "•*-"
+
+# Diterapkan pada sisa baris setelah bullet & penanda tebal dibuang; tidak ada kuantifier
+# yang saling tumpang tindih, sehingga tidak terjadi backtracking.
+LABEL_PATTERN = re.compile(r"(program|deskripsi|okr)\b[\s*_]*:[\s*_]*", re.IGNORECASE)
+
+FIELD_NAMES = {"program": "program", "deskripsi": "deskripsi", "okr": "okr"}
+
+SOURCES_PATTERN = re.compile(r"sumber[\s*_]*:", re.IGNORECASE)
+
+
+def format_ai_item(program: str, deskripsi: str, okr: str) -> str:
+    item_string = f"**Program:** {program}  \n"
+    item_string += f"**Deskripsi:** {deskripsi}  \n"
+    item_string += f"**OKR :** {okr}"
+    return item_string
+
+
+def is_sources_line(line: str) -> bool:
+    """
+    True jika baris membuka bagian `Sumber` (mis. `Sumber:`, `**Sumber:**`, `## Sumber`).
+    Baris menjorok hanya dihitung jika diikuti titik dua, agar kalimat deskripsi
+    seperti "Sumber daya ..." tidak ikut terpotong.
+    """
+    text = line.lstrip("*_# \t")
+    if text[:6].lower() != "sumber":
+        return False
+    return not line[:1].isspace() or bool(SOURCES_PATTERN.match(text))
+
+
+def split_sources(ai_text_response: str):
+    """
+    Memisahkan daftar program dari bagian `Sumber` di akhir respons.
+
+    Returns:
+        (tuple): (content_part, sources_part)
+    """
+    lines = ai_text_response.splitlines(keepends=True)
+    for idx, line in enumerate(lines):
+        if is_sources_line(line):
+            return "".join(lines[:idx]), "".join(lines[idx:])
+    return ai_text_response, ""
+
+
+def match_label(line: str):
+    """
+    Mengenali baris berlabel (`- Program: ...`, `**Deskripsi:** ...`, `OKR : ...`).
+
+    Returns:
+        (tuple): (nama_field, nilai) atau (None, None) jika baris bukan baris berlabel.
+    """
+    text = line.strip()
+    if text[:1] in BULLET_CHARS and text[:2] != "**":
+        text = text[1:].lstrip()
+    text = text.lstrip("*_").lstrip()
+    match = LABEL_PATTERN.match(text)
+    if not match:
+        return None, None
+    return FIELD_NAMES[match.group(1).lower()], text[match.end():].rstrip("*_ \t")
+
+
+class InsightLineParser:
+    """
+    State machine per baris untuk blok Program/Deskripsi/OKR.
+
+    `feed_line()` mengembalikan item sebelumnya begitu item tersebut ditutup oleh baris
+    `Program:` berikutnya; `finish()` menutup item terakhir.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.current_field = None
+
+    def feed_line(self, line: str):
+        field, value = match_label(line)
+        if field == "program":
+            completed = self.finish()
+            self.current = {"program": [value], "deskripsi": [], "okr": []}
+            self.current_field = "program"
+            return completed
+        if self.current is None:
+            # Teks pembuka sebelum item pertama diabaikan.
+            return None
+        if field is not None:
+            self.current_field = field
+            self.current[field].append(value)
+        elif line.strip(" \t*_" + BULLET_CHARS):
+            self.current[self.current_field].append(line.strip())
+        else:
+            # Baris kosong / hanya penanda markdown: pertahankan jeda paragraf saja.
+            self.current[self.current_field].append("")
+        return None
+
+    def finish(self):
+        """
+        Returns:
+            (dict): Item yang sedang berjalan {'program', 'deskripsi', 'okr'} (atau None).
+        """
+        if self.current is None:
+            return None
+        item = {name: "\n".join(parts).strip() for name, parts in self.current.items()}
+        self.current = None
+        self.current_field = None
+        return item if item["program"] else None
+
+    def peek(self):
+        """
+        Item yang sedang berjalan (belum ditutup), tanpa mengubah state.
+        """
+        if self.current is None:
+            return None
+        return {name: "\n".join(parts).strip() for name, parts in self.current.items()}
+
+
+def parse_ai_json_response(ai_json_response: str):
+    """
+    Membaca output mode JSON (response_schema) langsung menjadi daftar program,
+    tanpa parsing teks.
+
+    Returns:
+        (tuple): (ai_markdown_items, ai_data_list, sources_part, parse_failed)
+    """
+    data = json.loads(ai_json_response)
+    programs = data.get("programs", []) if isinstance(data, dict) else data
+    sources = data.get("sumber", []) if isinstance(data, dict) else []
+
+    ai_markdown_items = []
+    ai_data_list = []
+    for entry in programs or []:
+        if not isinstance(entry, dict):
+            continue
+        item = {name: str(entry.get(name) or "").strip() for name in ("program", "deskripsi", "okr")}
+        if item["program"]:
+            ai_markdown_items.append(format_ai_item(item["program"], item["deskripsi"], item["okr"]))
+            ai_data_list.append(item)
+
+    source_lines = []
+    for source in sources or []:
+        if isinstance(source, dict):
+            parts = [str(source.get(name) or "").strip() for name in ("nama", "judul", "url")]
+            source_lines.append("- " + " - ".join(part for part in parts if part))
+        elif source:
+            source_lines.append(f"- {source}")
+    sources_part = "Sumber:\n" + "\n".join(source_lines) if source_lines else ""
+
+    return ai_markdown_items, ai_data_list, sources_part, not ai_data_list and not sources_part
+
+
+def parse_ai_response(ai_text_response: str):
+    """
+    Mem-parsing output teks Gemini menjadi daftar program, bagian sumber, dan status parsing.
+    Output mode JSON (diawali `{` atau `[`) dibaca langsung lewat `parse_ai_json_response`.
+
+    Returns:
+        (tuple): (ai_markdown_items, ai_data_list, sources_part, parse_failed)
+    """
+    ai_markdown_items = []
+    ai_data_list = []
+
+    if not ai_text_response:
+        return ai_markdown_items, ai_data_list, "", False
+    if not isinstance(ai_text_response, str):
+        ai_text_response = str(ai_text_response)
+
+    if ai_text_response.lstrip()[:1] in ("{", "["):
+        try:
+            return parse_ai_json_response(ai_text_response)
+        except ValueError:
+            pass
+
+    content_part, sources_part = split_sources(ai_text_response)
+
+    parser = InsightLineParser()
+    items = [parser.feed_line(line) for line in content_part.splitlines()]
+    items.append(parser.finish())
+    for item in items:
+        if item:
+            ai_markdown_items.append(format_ai_item(item["program"], item["deskripsi"], item["okr"]))
+            ai_data_list.append(item)
+
+    parse_failed = not ai_data_list and not sources_part
+    return ai_markdown_items, ai_data_list, sources_part, parse_failed
+
+
+class StreamingInsightParser:
+    """
+    Parser inkremental untuk output streaming: baris yang sudah lengkap langsung diproses
+    oleh InsightLineParser, dan sebuah blok `- Program:` dianggap selesai begitu blok
+    Program berikutnya atau bagian `Sumber` dimulai.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.line_start = 0
+        self.sources_started = False
+        self.markdown_items = []
+        self.data_items = []
+        self._parser = InsightLineParser()
+
+    def _add_item(self, item, new_items: list):
+        if item:
+            markdown = format_ai_item(item["program"], item["deskripsi"], item["okr"])
+            self.markdown_items.append(markdown)
+            self.data_items.append(item)
+            new_items.append(markdown)
+
+    def feed(self, chunk: str) -> list:
+        """
+        Menambahkan potongan teks baru.
+
+        Returns:
+            (list): Item markdown yang baru selesai di-parsing pada potongan ini.
+        """
+        self.buffer += chunk
+        new_items = []
+        while not self.sources_started:
+            line_end = self.buffer.find("\n", self.line_start)
+            if line_end == -1:
+                break
+            line = self.buffer[self.line_start:line_end]
+            self.line_start = line_end + 1
+            if is_sources_line(line):
+                self.sources_started = True
+                self._add_item(self._parser.finish(), new_items)
+                break
+            self._add_item(self._parser.feed_line(line), new_items)
+        return new_items
+
+    def pending_text(self) -> str:
+        """
+        Teks blok yang masih berjalan (belum ditutup), untuk ditampilkan apa adanya.
+        """
+        if self.sources_started:
+            return ""
+        current = self._parser.peek()
+        tail = self.buffer[self.line_start:].strip()
+        if current is None:
+            return tail
+        lines = [f"**Program:** {current['program']}"]
+        if current["deskripsi"]:
+            lines.append(f"**Deskripsi:** {current['deskripsi']}")
+        if current["okr"]:
+            lines.append(f"**OKR :** {current['okr']}")
+        if tail:
+            lines.append(tail)
+        return "  \n".join(lines)
@@ -0,0 +1,1302 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from google.genai import errors, types
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from gemini_scheduler import GeminiCallScheduler, estimate_tokens
+from insight_cache import DEFAULT_CACHE_PATH, InsightCache, hash_text, make_cache_key
+from insight_manifest import (
+    CHANGE_LABELS,
+    CHANGE_REMOVED,
+    DEFAULT_MANIFEST_PATH,
+    REGENERATE_CHANGES,
+    InsightManifest,
+    programs_fingerprint,
+)
+from insight_metrics import DEFAULT_METRICS_PATH, InsightMetrics, RunTrace, usage_fields
+from insight_parser import parse_ai_response
+from program_similarity import DEFAULT_DUPLICATE_THRESHOLD, match_programs
+from prompt_budget import DEFAULT_CONTEXT_CACHE_TTL_SECONDS, DEFAULT_DEFINITION_TOKEN_BUDGET, PromptBudget
+
+
+# --- Pipeline insight (tanpa Streamlit) ---
+# Dipakai oleh app_final.py (UI) dan insight_cli.py (batch malam hari): parsing workbook,
+# indeks definisi cluster, prompt & panggilan Gemini, mode batch, dan ekspor Excel.
+
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+
+# --- Cache insight bersama (SQLite), dapat diatur lewat environment variable ---
+INSIGHT_CACHE_PATH = os.environ.get("INSIGHT_CACHE_PATH", DEFAULT_CACHE_PATH)
+INSIGHT_CACHE_TTL_HOURS = float(os.environ.get("INSIGHT_CACHE_TTL_HOURS", 24 * 7))
+INSIGHT_CACHE_MAX_ENTRIES = int(os.environ.get("INSIGHT_CACHE_MAX_ENTRIES", 2000))
+
+# --- Scheduler panggilan Gemini (coalescing, rate limit RPM/TPM, retry, antrian terbatas) ---
+GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", 60))
+GEMINI_TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", 250_000))
+GEMINI_MAX_CONCURRENT_CALLS = int(os.environ.get("GEMINI_MAX_CONCURRENT_CALLS", 8))
+GEMINI_MAX_QUEUE_SIZE = int(os.environ.get("GEMINI_MAX_QUEUE_SIZE", 32))
+GEMINI_EXPECTED_OUTPUT_TOKENS = 2048
+
+# --- Manifest fingerprint untuk analisis ulang inkremental (tanpa TTL) ---
+INSIGHT_MANIFEST_PATH = os.environ.get("INSIGHT_MANIFEST_PATH", DEFAULT_MANIFEST_PATH)
+
+# --- Parsing multi-workbook paralel (0 = jumlah CPU) ---
+WORKBOOK_PARSE_PROCESSES = int(os.environ.get("WORKBOOK_PARSE_PROCESSES", 0))
+
+# --- Input CSV: jumlah baris per chunk saat membaca file CSV besar ---
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", 50_000))
+
+# --- Deteksi duplikat program AI vs existing (skor kemiripan 0..1) ---
+PROGRAM_DUPLICATE_THRESHOLD = float(os.environ.get("PROGRAM_DUPLICATE_THRESHOLD", DEFAULT_DUPLICATE_THRESHOLD))
+
+# --- Metrik per tahap (file JSONL; string kosong = hanya logger `insight_metrics`) ---
+INSIGHT_METRICS_PATH = os.environ.get("INSIGHT_METRICS_PATH", DEFAULT_METRICS_PATH)
+
+# --- Anggaran token prompt & context caching (0 = tanpa batas / nonaktif) ---
+PROMPT_DEFINITION_TOKEN_BUDGET = int(os.environ.get("PROMPT_DEFINITION_TOKEN_BUDGET", DEFAULT_DEFINITION_TOKEN_BUDGET))
+GEMINI_CONTEXT_CACHE_ENABLED = os.environ.get("GEMINI_CONTEXT_CACHE", "1") != "0"
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL_SECONDS", DEFAULT_CONTEXT_CACHE_TTL_SECONDS))
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.environ.get("GEMINI_CONTEXT_CACHE_MIN_TOKENS", 0)) or None
+
+
+def create_insight_cache() -> InsightCache:
+    """
+    Cache insight dengan konfigurasi dari environment (dipakai bersama UI dan CLI).
+    """
+    return InsightCache(
+        path=INSIGHT_CACHE_PATH,
+        ttl_seconds=INSIGHT_CACHE_TTL_HOURS * 60 * 60,
+        max_entries=INSIGHT_CACHE_MAX_ENTRIES
+    )
+
+
+def create_insight_manifest() -> InsightManifest:
+    """
+    Manifest fingerprint cluster dengan path dari environment (dipakai bersama UI dan CLI).
+    """
+    return InsightManifest(path=INSIGHT_MANIFEST_PATH)
+
+
+def create_gemini_scheduler() -> GeminiCallScheduler:
+    """
+    Scheduler panggilan Gemini dengan kuota dari environment.
+    """
+    return GeminiCallScheduler(
+        requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+        tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+        max_concurrent_calls=GEMINI_MAX_CONCURRENT_CALLS,
+        max_queue_size=GEMINI_MAX_QUEUE_SIZE
+    )
+
+
+def create_insight_metrics() -> InsightMetrics:
+    """
+    Penampung metrik dengan file JSONL dari environment (dipakai bersama UI dan CLI).
+    """
+    return InsightMetrics(path=INSIGHT_METRICS_PATH or None)
+
+
+def create_prompt_budget() -> PromptBudget:
+    """
+    Anggaran token prompt dengan konfigurasi dari environment.
+    """
+    return PromptBudget(
+        definition_token_budget=PROMPT_DEFINITION_TOKEN_BUDGET,
+        context_cache_ttl_seconds=GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+        enable_context_cache=GEMINI_CONTEXT_CACHE_ENABLED,
+        min_context_cache_tokens=GEMINI_CONTEXT_CACHE_MIN_TOKENS
+    )
+
+
+# Satu instance per proses (modul tetap ter-load lintas rerun Streamlit): memo hitungan
+# token dan cached content dipakai bersama semua sesi, mode batch, dan CLI.
+prompt_budget = create_prompt_budget()
+
+
+# --- 1. WORKBOOK ---
+def read_workbook_sheets(excel_data: bytes, trace: RunTrace = None) -> dict:
+    """
+    Mem-parsing seluruh sheet workbook menjadi DataFrame.
+
+    Returns:
+        (dict): {nama_sheet: DataFrame}. Sheet CLUSTER dibaca tanpa header.
+    """
+    with (trace or RunTrace()).stage('sheet_parse', workbook_kb=round(len(excel_data) / 1024, 1)) as event:
+        xls = pd.ExcelFile(BytesIO(excel_data))
+        sheets = {}
+        for name in xls.sheet_names:
+            header = None if name.strip().lower() == 'cluster' else 0
+            sheets[name] = xls.parse(name, header=header)
+        event['sheets'] = len(sheets)
+    return sheets
+
+
+def find_cluster_sheet_name(sheets: dict):
+    """
+    Nama sheet CLUSTER (tidak peka huruf besar/kecil dan spasi), atau None.
+    """
+    return next((name for name in sheets if name.strip().lower() == 'cluster'), None)
+
+
+def get_division_sheet_names(sheets: dict) -> list:
+    """
+    Sheet divisi yang bisa dipilih (semua sheet kecuali CLUSTER).
+    """
+    return [name for name in sheets if name.strip().lower() != 'cluster']
+
+
+SHEET_TO_DIVISION_MAP = {
+    "information technology": "it", 
+    "corporate legal & compliance": "corporate legal & compliance",
+    "operation": "operation",
+    "merchandising": "merchandising",
+    "marketing": "marketing",
+    "business controlling": "business controlling",
+    "service quality": "service quality",
+    "property development": "property development",
+    "corporate audit": "corporate audit",
+    "finance": "finance",
+    "human capital": "human capital"
+}
+
+LOGISTICS_ONLY_CLUSTERS = [
+    "Inventory & Stock Management",
+    "Supplier & Service Level",
+    "Warehouse & Project Execution",
+    "System Development"
+]
+
+MISSING_DEFINITION_TEXT = "(Definisi tidak ditemukan di Sheet CLUSTER)"
+
+
+def division_key(sheet_name: str) -> str:
+    """
+    Nama divisi (huruf kecil) di sheet CLUSTER untuk sebuah nama sheet.
+    """
+    return SHEET_TO_DIVISION_MAP.get(sheet_name.strip().lower(), sheet_name.strip().lower())
+
+
+def build_cluster_definition_index(df_cluster_def, division_targets) -> dict:
+    """
+    Membangun indeks definisi cluster untuk semua divisi dalam satu pass vektor atas
+    sheet CLUSTER (operasi string pandas + boolean mask, tanpa iterasi per baris).
+
+    Blok sebuah divisi dimulai setelah baris judul divisi tersebut dan berakhir pada
+    baris kosong pertama atau judul divisi lain (kolom B kosong / 'desc').
+
+    Returns:
+        (dict): {divisi: {nama_cluster: definisi}} untuk setiap divisi di `division_targets`.
+    """
+    index = {target: {} for target in division_targets}
+    if df_cluster_def is None or df_cluster_def.shape[1] == 0 or df_cluster_def.empty:
+        return index
+
+    def clean(col):
+        return col.where(col.notna(), "").astype(str).str.strip()
+
+    series_a = clean(df_cluster_def.iloc[:, 0])
+    series_b = clean(df_cluster_def.iloc[:, 1]) if df_cluster_def.shape[1] > 1 else pd.Series("", index=df_cluster_def.index)
+    col_a = series_a.to_numpy(dtype=object)
+    col_b = series_b.to_numpy(dtype=object)
+    col_a_lower = series_a.str.lower().to_numpy(dtype=object)
+    col_b_lower = series_b.str.lower().to_numpy(dtype=object)
+
+    all_division_names_lower = list({v.lower() for v in SHEET_TO_DIVISION_MAP.values()})
+    is_empty_row = (col_a == "") & (col_b == "")
+    is_division_header = np.isin(col_a_lower, all_division_names_lower) & ((col_b == "") | (col_b_lower == "desc"))
+    is_valid_row = ~np.isin(col_a_lower, ['', 'cluster', 'nan']) & ~np.isin(col_b_lower, ['', 'desc', 'nan'])
+
+    empty_positions = np.flatnonzero(is_empty_row)
+    header_positions = np.flatnonzero(is_division_header)
+    header_names = col_a_lower[header_positions]
+    total_rows = len(col_a)
+
+    for target in division_targets:
+        start_hits = np.flatnonzero(col_a_lower == target)
+        if len(start_hits) == 0:
+            continue
+        start = start_hits[0]
+        other_headers = header_positions[header_names != target]
+        end = total_rows
+        for stops in (empty_positions, other_headers):
+            next_stop = np.searchsorted(stops, start, side='right')
+            if next_stop < len(stops):
+                end = min(end, stops[next_stop])
+        segment = slice(start + 1, end)
+        keep = is_valid_row[segment]
+        index[target] = dict(zip(col_a[segment][keep], col_b[segment][keep]))
+    return index
+
+
+def build_workbook_cluster_index(sheets: dict, trace: RunTrace = None) -> dict:
+    """
+    Indeks {divisi: {cluster: definisi}} dari sheet CLUSTER sebuah workbook.
+    Lookup untuk sheet mana pun cukup `index.get(division_key(sheet), {})`.
+    """
+    with (trace or RunTrace()).stage('cluster_index') as event:
+        cluster_sheet_name = find_cluster_sheet_name(sheets)
+        division_targets = {v.lower() for v in SHEET_TO_DIVISION_MAP.values()}
+        division_targets.update(division_key(name) for name in get_division_sheet_names(sheets))
+        df_cluster_def = sheets[cluster_sheet_name] if cluster_sheet_name else None
+        cluster_index = build_cluster_definition_index(df_cluster_def, sorted(division_targets))
+        event['clusters'] = sum(len(definitions) for definitions in cluster_index.values())
+    return cluster_index
+
+
+def collect_cluster_jobs(program_index: dict, cluster_index: dict, sheet_names: list = None):
+    """
+    Menyusun daftar job (satu per cluster) untuk mode batch / CLI.
+
+    Args:
+        program_index (dict): {nama_sheet: indeks dari `build_sheet_program_index`}.
+
+    Returns:
+        (tuple): (jobs, skipped). `jobs` berisi dict 'divisi', 'cluster', 'cluster_definition';
+            `skipped` berisi "sheet / cluster" yang definisinya tidak ditemukan.
+    """
+    jobs = []
+    skipped = []
+    for sheet in sheet_names or list(program_index):
+        sheet_index = program_index.get(sheet)
+        if sheet_index is None:
+            continue
+        sheet_cluster_dict = cluster_index.get(division_key(sheet), {})
+        for cluster in sheet_index['clusters']:
+            definition = sheet_cluster_dict.get(cluster.strip())
+            if definition:
+                jobs.append({'divisi': sheet, 'cluster': cluster, 'cluster_definition': definition})
+            else:
+                skipped.append(f"{sheet} / {cluster}")
+    return jobs, skipped
+
+
+# Kolom wajib sheet divisi; sheet tanpa salah satunya (mis. sheet rekap) tidak diindeks.
+PROGRAM_INDEX_COLUMNS = ['Cluster', 'Program Kerja', 'Deskripsi']
+
+
+def has_program_columns(df) -> bool:
+    return all(column in df.columns for column in PROGRAM_INDEX_COLUMNS)
+
+
+class SheetProgramIndexBuilder:
+    """
+    Penyusun indeks program existing satu sheet/divisi secara bertahap: `add()` bisa
+    dipanggil berulang untuk potongan data (mis. chunk CSV), `build()` menghasilkan
+    indeks yang sama seperti jika seluruh data diproses sekaligus.
+    """
+
+    def __init__(self, sheet_name: str):
+        self.sheet_name = sheet_name
+        self._clusters = {}
+        self._grouped = {}
+
+    def add(self, df):
+        """
+        Menambahkan baris DataFrame berkolom 'Cluster', 'Program Kerja', 'Deskripsi'.
+        Kolom 'Cluster' dinormalisasi (str + strip) dan markdown setiap program
+        langsung di-render.
+        """
+        cluster_keys = df['Cluster'].astype(str).str.strip()
+        self._clusters.update(dict.fromkeys(cluster_keys[df['Cluster'].notna()].unique().tolist()))
+
+        programs = df['Program Kerja']
+        descriptions = df['Deskripsi']
+        has_program = (programs.notna() & programs.astype(str).str.strip().ne('')).to_numpy(dtype=bool)
+        has_description = (descriptions.notna() & descriptions.astype(str).str.strip().ne('')).to_numpy(dtype=bool)
+
+        grouped = self._grouped
+        for cluster, program, deskripsi, with_description in zip(
+            cluster_keys.to_numpy(dtype=object)[has_program],
+            programs.to_numpy(dtype=object)[has_program],
+            descriptions.to_numpy(dtype=object)[has_program],
+            has_description[has_program]
+        ):
+            item_string = f"**Program:** {program}  \n"
+            if with_description:
+                item_string += f"**Deskripsi:** {deskripsi}"
+            markdown_items, data_list = grouped.setdefault(cluster, ([], []))
+            markdown_items.append(item_string)
+            data_list.append({'program': program, 'deskripsi': deskripsi})
+
+    def build(self) -> dict:
+        """
+        Cluster khusus logistik dikecualikan dari daftar pilihan untuk sheet Operation.
+
+        Returns:
+            (dict): 'clusters' (daftar cluster yang bisa dianalisis, terurut) dan 'programs'
+                ({cluster: (existing_markdown_items, existing_data_list)}).
+        """
+        all_clusters_in_sheet = [c for c in self._clusters if c.lower() not in ['cluster', 'nan']]
+        if self.sheet_name.strip().lower() == "operation":
+            all_clusters_in_sheet = [c for c in all_clusters_in_sheet if c not in LOGISTICS_ONLY_CLUSTERS]
+        return {'clusters': sorted(all_clusters_in_sheet), 'programs': self._grouped}
+
+
+def build_sheet_program_index(df, sheet_name: str) -> dict:
+    """
+    Mengelompokkan program kerja existing sebuah sheet per cluster dalam satu pass,
+    sehingga pergantian cluster dan mode batch cukup melakukan lookup dict.
+
+    Returns:
+        (dict): Lihat `SheetProgramIndexBuilder.build`.
+    """
+    builder = SheetProgramIndexBuilder(sheet_name)
+    builder.add(df)
+    return builder.build()
+
+
+def build_workbook_program_index(sheets: dict, sheet_names: list = None, trace: RunTrace = None) -> dict:
+    """
+    Indeks program existing untuk setiap sheet divisi yang memiliki kolom 'Cluster',
+    'Program Kerja', dan 'Deskripsi'; sheet lain (mis. sheet rekap) dilewati.
+
+    Returns:
+        (dict): {nama_sheet: indeks dari `build_sheet_program_index`}.
+    """
+    program_index = {}
+    for sheet in sheet_names or get_division_sheet_names(sheets):
+        df_sheet = sheets[sheet]
+        if not has_program_columns(df_sheet):
+            continue
+        with (trace or RunTrace()).stage('program_index', divisi=sheet) as event:
+            program_index[sheet] = build_sheet_program_index(df_sheet, sheet)
+            event['clusters'] = len(program_index[sheet]['clusters'])
+    return program_index
+
+
+def get_existing_programs(sheet_index: dict, cluster: str):
+    """
+    Mengambil program kerja existing untuk sebuah cluster dari indeks sheet.
+
+    Returns:
+        (tuple): (existing_markdown_items, existing_data_list)
+    """
+    return sheet_index['programs'].get(cluster.strip(), ([], []))
+
+
+COMPARISON_COLUMNS = [
+    'Program_Existing', 'Deskripsi_Existing', 
+    'Program_AI', 'Deskripsi_AI', 'OKR_AI',
+    'Program_Existing_Terdekat', 'Skor_Kemiripan', 'Duplikat'
+]
+
+def match_ai_programs(existing_data_list: list, ai_data_list: list, trace: RunTrace = None, **fields) -> list:
+    """
+    Program existing terdekat untuk setiap program AI (lihat `program_similarity.match_programs`)
+    dengan ambang duplikat `PROGRAM_DUPLICATE_THRESHOLD`.
+    """
+    with (trace or RunTrace()).stage('similarity', existing=len(existing_data_list), ai=len(ai_data_list), **fields) as event:
+        matches = match_programs(existing_data_list, ai_data_list, threshold=PROGRAM_DUPLICATE_THRESHOLD)
+        event['duplicates'] = sum(1 for match in matches if match['duplicate'])
+    return matches
+
+
+def build_comparison_df(existing_data_list: list, ai_data_list: list, matches: list = None):
+    """
+    Menyusun DataFrame perbandingan (existing vs AI) untuk diekspor ke Excel. Setiap baris
+    AI dilengkapi program existing terdekat, skor kemiripan, dan penanda duplikat
+    (`matches` dihitung jika tidak diberikan).
+    """
+    if matches is None:
+        matches = match_ai_programs(existing_data_list, ai_data_list)
+    all_rows_data = []
+    max_rows_for_df = max(len(existing_data_list), len(ai_data_list))
+    for i in range(max_rows_for_df):
+        row_data = {}
+        if i < len(existing_data_list):
+            row_data['Program_Existing'] = existing_data_list[i]['program']
+            row_data['Deskripsi_Existing'] = existing_data_list[i]['deskripsi']
+        else:
+            row_data['Program_Existing'] = None
+            row_data['Deskripsi_Existing'] = None
+        if i < len(ai_data_list):
+            row_data['Program_AI'] = ai_data_list[i]['program']
+            row_data['Deskripsi_AI'] = ai_data_list[i]['deskripsi']
+            row_data['OKR_AI'] = ai_data_list[i]['okr']
+            row_data['Program_Existing_Terdekat'] = matches[i]['match_program']
+            row_data['Skor_Kemiripan'] = matches[i]['score']
+            row_data['Duplikat'] = "Ya" if matches[i]['duplicate'] else "Tidak"
+        else:
+            row_data['Program_AI'] = None
+            row_data['Deskripsi_AI'] = None
+            row_data['OKR_AI'] = None
+            row_data['Program_Existing_Terdekat'] = None
+            row_data['Skor_Kemiripan'] = None
+            row_data['Duplikat'] = None
+        all_rows_data.append(row_data)
+
+    return pd.DataFrame(all_rows_data, columns=COMPARISON_COLUMNS)
+
+
+# --- 2. PROMPT & CALL GEMINI (Fungsi 1) ---
+# Mode output: teks berpoin (di-parsing insight_parser) atau JSON terstruktur (response_schema).
+OUTPUT_MODE_TEXT = "text"
+OUTPUT_MODE_JSON = "json"
+
+INSIGHT_RESPONSE_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "programs": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "program": types.Schema(type=types.Type.STRING),
+                    "deskripsi": types.Schema(type=types.Type.STRING),
+                    "okr": types.Schema(type=types.Type.STRING, enum=["Objectives", "Key Results"]),
+                },
+                required=["program", "deskripsi", "okr"],
+                property_ordering=["program", "deskripsi", "okr"],
+            ),
+        ),
+        "sumber": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "nama": types.Schema(type=types.Type.STRING),
+                    "judul": types.Schema(type=types.Type.STRING),
+                    "url": types.Schema(type=types.Type.STRING),
+                },
+                required=["nama", "url"],
+                property_ordering=["nama", "judul", "url"],
+            ),
+        ),
+    },
+    required=["programs", "sumber"],
+    property_ordering=["programs", "sumber"],
+)
+
+
+PROMPT_CONTEXT_NOTE = "Pesan pengguna berisi DEFINISI CLUSTER SAAT INI (KONTEKS) serta nama Divisi dan Cluster yang dianalisis; gunakan definisi tersebut sebagai konteks utama."
+
+
+def build_system_prompt(output_mode: str = OUTPUT_MODE_TEXT) -> str:
+    """
+    Menyusun blok instruksi statis (sama untuk semua divisi & cluster), sehingga bisa
+    disimpan sebagai cached content Gemini. Divisi, cluster, dan definisinya dikirim
+    di pesan pengguna (`build_user_prompt`).
+    """
+    if output_mode == OUTPUT_MODE_JSON:
+        return build_json_system_prompt()
+
+    # (PROMPT DARI PERCAKAPAN SEBELUMNYA SUDAH BENAR)
+    return f"""
+    Anda adalah AI yang bertugas membuat daftar program kerja (job programs) dan deskripsi yang relevan untuk Divisi dan Cluster yang disebutkan pada pesan pengguna menurut insight anda sendiri yang dicari dari internet dan menentukan apakah
+    itu termasuk dalam OKR tipe Objectives (Objectives (tujuan): Apa yang ingin dicapai? Objectives harus jelas, ringkas, dan inspiratif) atau Key Results(Key Results (hasil kunci): Bagaimana cara mencapai tujuan tersebut? Key results adalah indikator terukur yang menunjukkan seberapa dekat kita dengan pencapaian objective).
+
+    {PROMPT_CONTEXT_NOTE}
+
+    INSTRUKSI SANGAT KETAT (HARUS DIIKUTI):
+    1.  Output WAJIB dalam bahasa Indonesia.
+    2.  Buat beberapa program kerja baru yang relevan dengan cluster ini, FOKUS pada tren industri ritel modern.
+    3.  JANGAN PERNAH menulis paragraf pembuka, sapaan, atau penjelasan (Contoh: "Sebagai seorang ahli...", "Berikut adalah...", dsb.).
+    4.  JANGAN PERNAH menulis kesimpulan atau ringkasan di bagian akhir.
+    5.  Output Anda HARUS dan HANYA BOLEH berisi daftar berpoin (bullet points), dimulai dengan tanda `-` atau `*`.
+    6.  Setiap poin WAJIB mengikuti format `Program:`, `Deskripsi:`, dan `OKR:` persis seperti contoh di bawah.
+    7.  Di bagian PALING AKHIR, setelah semua daftar program, tambahkan bagian `Sumber:` dan berikan beberapa sitasi terpercaya (situs resmi seperti Amazon dll., jurnal pendidikan, laporan industri) dengan link yang bisa diakses. JANGAN gunakan blog pribadi.
+
+    BENTUK OUTPUT (WAJIB DIIKUTI PERSIS):
+
+    - Program: [Nama Program Kerja 1 Sesuai Tren]
+      Deskripsi: [Deskripsi singkat untuk program 1 yang relevan dengan tren]
+      OKR : [Tentukan apakah program ini termasuk Objectives atau Key Results. JAWAB HANYA DENGAN `Objectives` atau `Key Results`]
+
+    - Program: [Nama Program Kerja 2 Sesuai Tren]
+      Deskripsi: [Deskripsi singkat untuk program 2 yang relevan dengan tren]
+      OKR : [Tentukan apakah program ini termasuk Objectives atau Key Results. JAWAB HANYA DENGAN `Objectives` atau `Key Results`]
+
+    - Program: [Nama Program Kerja 3 Sesuai Tren]
+      Deskripsi: [Deskripsi singkat untuk program 3 yang relevan dengan tren]
+      OKR : [Tentukan apakah program ini termasuk Objectives atau Key Results. JAWAB HANYA DENGAN `Objectives` atau `Key Results`]
+
+    Sumber:
+    - [Nama Jurnal/Laporan/Situs Resmi] - Judul - https://contoh.url/
+    - [Nama Jurnal/Laporan/Situs Resmi] - Judul - https://contoh.url/
+    """
+
+
+def build_json_system_prompt() -> str:
+    """
+    System prompt untuk mode JSON: format output ditentukan oleh INSIGHT_RESPONSE_SCHEMA,
+    sehingga template bullet tidak perlu dikirim.
+    """
+    return f"""
+    Anda adalah AI yang bertugas membuat daftar program kerja (job programs) dan deskripsi yang relevan untuk Divisi dan Cluster yang disebutkan pada pesan pengguna menurut insight anda sendiri yang dicari dari internet dan menentukan apakah
+    itu termasuk dalam OKR tipe Objectives (Objectives (tujuan): Apa yang ingin dicapai? Objectives harus jelas, ringkas, dan inspiratif) atau Key Results(Key Results (hasil kunci): Bagaimana cara mencapai tujuan tersebut? Key results adalah indikator terukur yang menunjukkan seberapa dekat kita dengan pencapaian objective).
+
+    {PROMPT_CONTEXT_NOTE}
+
+    INSTRUKSI SANGAT KETAT (HARUS DIIKUTI):
+    1.  Output WAJIB dalam bahasa Indonesia.
+    2.  Buat beberapa program kerja baru yang relevan dengan cluster ini, FOKUS pada tren industri ritel modern.
+    3.  Isi `programs` dengan daftar program: `program` (nama program kerja sesuai tren), `deskripsi` (deskripsi singkat yang relevan dengan tren), dan `okr` (HANYA `Objectives` atau `Key Results`).
+    4.  Isi `sumber` dengan beberapa sitasi terpercaya (situs resmi seperti Amazon dll., jurnal pendidikan, laporan industri): `nama`, `judul`, dan `url` yang bisa diakses. JANGAN gunakan blog pribadi.
+    """
+
+
+def build_generate_config(output_mode: str = OUTPUT_MODE_TEXT, cached_content: str = None):
+    """
+    GenerateContentConfig untuk panggilan insight; mode JSON menambahkan response_schema.
+    Jika `cached_content` diisi, instruksi statis diambil dari cached content Gemini
+    (API tidak menerima system_instruction bersamaan dengan cached_content).
+    """
+    instruction = {"cached_content": cached_content} if cached_content else {"system_instruction": build_system_prompt(output_mode)}
+    if output_mode == OUTPUT_MODE_JSON:
+        return types.GenerateContentConfig(
+            **instruction,
+            response_mime_type="application/json",
+            response_schema=INSIGHT_RESPONSE_SCHEMA
+        )
+    return types.GenerateContentConfig(**instruction)
+
+
+def build_user_prompt(divisi: str, cluster: str, cluster_definition: str) -> str:
+    return (
+        f"DEFINISI CLUSTER SAAT INI (KONTEKS):\n'{cluster_definition}'\n\n"
+        f"Berikan insight AI untuk Divisi: {divisi}, Cluster: {cluster}"
+    )
+
+
+def prepare_insight_request(client, divisi: str, cluster: str, cluster_definition: str, model_name: str, output_mode: str = OUTPUT_MODE_TEXT):
+    """
+    Menyiapkan config dan pesan pengguna untuk satu panggilan insight: definisi cluster
+    disesuaikan dengan anggaran token, dan instruksi statis memakai cached content
+    jika model dan ukurannya memenuhi syarat.
+
+    Returns:
+        (tuple): (config, user_prompt, info) dengan `info` berisi jumlah token definisi,
+            status pemadatan/pemotongan, dan 'context_cache' ('on' / 'off').
+    """
+    definition, info = prompt_budget.fit_definition(client, model_name, cluster_definition)
+    cached_content = prompt_budget.context_cache(client, model_name, build_system_prompt(output_mode))
+    info['context_cache'] = 'on' if cached_content else 'off'
+    return build_generate_config(output_mode, cached_content), build_user_prompt(divisi, cluster, definition), info
+
+
+def is_stale_context_cache_error(config, error: Exception) -> bool:
+    """
+    True jika panggilan memakai cached content dan API menolaknya (kedaluwarsa / dihapus).
+    """
+    return bool(getattr(config, "cached_content", None)) and isinstance(error, errors.ClientError) and error.code in (400, 403, 404)
+
+
+def insight_cache_key(divisi: str, cluster: str, cluster_definition: str, model_name: str, output_mode: str = OUTPUT_MODE_TEXT) -> str:
+    """
+    Kunci cache insight: prompt lengkap + nama model + hash definisi cluster + anggaran
+    token definisi (pemadatan deterministik terhadap definisi asli dan anggaran).
+    """
+    return make_cache_key(
+        model_name,
+        build_system_prompt(output_mode),
+        build_user_prompt(divisi, cluster, cluster_definition),
+        hash_text(cluster_definition),
+        options={"definition_token_budget": PROMPT_DEFINITION_TOKEN_BUDGET}
+    )
+
+
+def request_strategic_insight(client, divisi: str, cluster: str, cluster_definition: str, model_name: str, output_mode: str = OUTPUT_MODE_TEXT, trace: RunTrace = None) -> str:
+    """
+    PANGGILAN API #1:
+    Melakukan panggilan API ke Gemini (MODE TEKS atau MODE JSON) untuk menghasilkan daftar insight strategis.
+    Tidak memanggil fungsi `st.*`, sehingga aman dijalankan dari thread worker (mode batch).
+    
+    Returns:
+        (str): Hasil teks mentah (atau dokumen JSON pada mode JSON). Error dari API diteruskan sebagai exception.
+    """
+    
+    trace = trace or RunTrace()
+    with trace.stage('prompt', divisi=divisi, cluster=cluster) as event:
+        config, user_prompt, prompt_info = prepare_insight_request(client, divisi, cluster, cluster_definition, model_name, output_mode)
+        event.update(prompt_info)
+
+    with trace.stage('api_call', divisi=divisi, cluster=cluster, model=model_name, output_mode=output_mode, context_cache=prompt_info['context_cache']) as event:
+        try:
+            response = client.models.generate_content(model=model_name, contents=user_prompt, config=config)
+        except Exception as e:
+            if not is_stale_context_cache_error(config, e):
+                raise
+            prompt_budget.invalidate_context_cache(config.cached_content)
+            config = build_generate_config(output_mode)
+            event['context_cache'] = 'stale'
+            response = client.models.generate_content(model=model_name, contents=user_prompt, config=config)
+        event.update(usage_fields(getattr(response, "usage_metadata", None)))
+
+    result = getattr(response, "text", None)
+    if output_mode == OUTPUT_MODE_JSON:
+        if not result:
+            raise ValueError("Respons JSON Gemini kosong.")
+        return result.strip()
+    if not result:
+        candidates = getattr(response, "candidates", None)
+        if candidates:
+            parts = []
+            for c in candidates:
+                val = getattr(c, "content", None) or getattr(c, "output", None) or getattr(c, "text", None)
+                if val:
+                    parts.append(str(val))
+                else:
+                    parts.append(str(c))
+            result = "\n".join(parts)
+        else:
+            result = str(response)
+
+    if isinstance(result, str):
+        return result.strip()
+    else:
+        return str(result).strip()
+
+
+def estimate_insight_tokens(divisi: str, cluster: str, cluster_definition: str, output_mode: str = OUTPUT_MODE_TEXT) -> int:
+    """
+    Perkiraan token input + output satu panggilan insight (untuk kuota TPM).
+    """
+    prompt_text = build_system_prompt(output_mode) + build_user_prompt(divisi, cluster, cluster_definition)
+    return estimate_tokens(prompt_text) + GEMINI_EXPECTED_OUTPUT_TOKENS
+
+
+def scheduled_strategic_insight(scheduler: GeminiCallScheduler, client, divisi: str, cluster: str, cluster_definition: str, model_name: str, output_mode: str = OUTPUT_MODE_TEXT, trace: RunTrace = None) -> str:
+    """
+    `request_strategic_insight` lewat scheduler: permintaan identik yang bersamaan
+    berbagi satu panggilan, dengan rate limit dan retry untuk 429/5xx.
+    """
+    return scheduler.call(
+        insight_cache_key(divisi, cluster, cluster_definition, model_name, output_mode),
+        request_strategic_insight,
+        client, divisi, cluster, cluster_definition, model_name, output_mode,
+        trace=trace,
+        estimated_tokens=estimate_insight_tokens(divisi, cluster, cluster_definition, output_mode)
+    )
+
+
+def request_strategic_insight_stream(client, divisi: str, cluster: str, cluster_definition: str, model_name: str, trace: RunTrace = None):
+    """
+    Versi streaming dari `request_strategic_insight` (memakai `generate_content_stream`).
+    Pemakaian token diambil dari `usage_metadata` potongan terakhir.
+
+    Yields:
+        (str): Potongan teks sesuai urutan kedatangan dari API.
+    """
+    trace = trace or RunTrace()
+    with trace.stage('prompt', divisi=divisi, cluster=cluster) as event:
+        config, user_prompt, prompt_info = prepare_insight_request(client, divisi, cluster, cluster_definition, model_name)
+        event.update(prompt_info)
+
+    with trace.stage('api_call', divisi=divisi, cluster=cluster, model=model_name, output_mode=OUTPUT_MODE_TEXT, streaming=True, context_cache=prompt_info['context_cache']) as event:
+        started_at = time.perf_counter()
+        while True:
+            try:
+                for chunk in client.models.generate_content_stream(model=model_name, contents=user_prompt, config=config):
+                    usage = getattr(chunk, "usage_metadata", None)
+                    if usage is not None:
+                        event.update(usage_fields(usage))
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        event.setdefault('first_chunk_ms', round((time.perf_counter() - started_at) * 1000, 2))
+                        yield text
+                return
+            except Exception as e:
+                # Cached content yang kedaluwarsa ditolak sebelum potongan pertama: ulang tanpa cache.
+                if 'first_chunk_ms' in event or not is_stale_context_cache_error(config, e):
+                    raise
+                prompt_budget.invalidate_context_cache(config.cached_content)
+                config = build_generate_config()
+                event['context_cache'] = 'stale'
+
+
+def scheduled_strategic_insight_stream(scheduler: GeminiCallScheduler, client, divisi: str, cluster: str, cluster_definition: str, model_name: str, trace: RunTrace = None):
+    """
+    `request_strategic_insight_stream` lewat antrian dan rate limiter scheduler.
+    Error 429/5xx diulang selama belum ada potongan teks yang diterima.
+    """
+    attempt = 0
+    while True:
+        received = False
+        try:
+            with scheduler.slot(estimate_insight_tokens(divisi, cluster, cluster_definition)):
+                for chunk in request_strategic_insight_stream(client, divisi, cluster, cluster_definition, model_name, trace):
+                    received = True
+                    yield chunk
+            return
+        except Exception as e:
+            if received or not scheduler.should_retry(e, attempt):
+                raise
+            scheduler.backoff(attempt)
+            attempt += 1
+
+# --- 3. MODE BATCH: banyak cluster sekaligus dengan panggilan Gemini paralel ---
+BATCH_DEFAULT_CONCURRENCY = 4
+BATCH_MAX_CONCURRENCY = 8
+
+def run_insight_batch(jobs: list, client, insight_cache: InsightCache, scheduler: GeminiCallScheduler, model_name: str, use_caching: bool, max_workers: int, on_result=None, output_mode: str = OUTPUT_MODE_TEXT, trace: RunTrace = None) -> list:
+    """
+    Menjalankan `request_strategic_insight` untuk banyak cluster lewat thread pool terbatas.
+    Hasil dari cache bersama dipakai lebih dulu; sisanya dikirim paralel (maks. `max_workers`).
+    `on_result(result)` dipanggil dari thread pemanggil setiap kali satu cluster selesai,
+    sehingga UI bisa diperbarui secara bertahap.
+
+    Args:
+        jobs (list): Daftar dict dengan kunci 'divisi', 'cluster', 'cluster_definition'.
+
+    Returns:
+        (list): Daftar dict hasil (urutan sama dengan `jobs`) dengan kunci tambahan
+            'text', 'status' ('cache' / 'api' / 'error') dan 'error'.
+    """
+    trace = trace or RunTrace()
+    results = [None] * len(jobs)
+    pending = []
+
+    for idx, job in enumerate(jobs):
+        cache_key = insight_cache_key(job['divisi'], job['cluster'], job['cluster_definition'], model_name, output_mode)
+        with trace.stage('cache_lookup', divisi=job['divisi'], cluster=job['cluster']) as event:
+            cached_text = insight_cache.get(cache_key) if use_caching else None
+            event['cache'] = 'hit' if cached_text else 'miss'
+        if cached_text:
+            results[idx] = dict(job, text=cached_text, status='cache', error=None)
+            if on_result:
+                on_result(results[idx])
+        else:
+            pending.append((idx, job, cache_key))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(
+                    scheduled_strategic_insight, scheduler, client,
+                    job['divisi'], job['cluster'], job['cluster_definition'], model_name, output_mode, trace
+                ): (idx, job, cache_key)
+                for idx, job, cache_key in pending
+            }
+            for future in as_completed(futures):
+                idx, job, cache_key = futures[future]
+                try:
+                    text = future.result()
+                    if not text:
+                        raise ValueError("Respons Gemini kosong.")
+                    insight_cache.set(cache_key, text, model_name=model_name)
+                    results[idx] = dict(job, text=text, status='api', error=None)
+                except Exception as e:
+                    results[idx] = dict(job, text=None, status='error', error=str(e))
+                if on_result:
+                    on_result(results[idx])
+
+    return results
+
+
+def build_batch_comparison_df(results: list, program_index: dict):
+    """
+    Menggabungkan hasil batch menjadi satu DataFrame perbandingan (kolom Divisi & Cluster di depan).
+    """
+    frames = []
+    for result in results:
+        _, existing_data_list = get_existing_programs(program_index[result['divisi']], result['cluster'])
+        _, ai_data_list, _, _ = parse_ai_response(result['text'])
+        df_cluster = build_comparison_df(existing_data_list, ai_data_list)
+        if df_cluster.empty:
+            df_cluster = pd.DataFrame([{c: None for c in COMPARISON_COLUMNS}])
+        df_cluster.insert(0, 'Cluster', result['cluster'])
+        df_cluster.insert(0, 'Divisi', result['divisi'])
+        df_cluster['Status_AI'] = result['status'] if not result['error'] else f"error: {result['error']}"
+        frames.append(df_cluster)
+    if not frames:
+        return pd.DataFrame(columns=['Divisi', 'Cluster'] + COMPARISON_COLUMNS + ['Status_AI'])
+    return pd.concat(frames, ignore_index=True)
+
+
+# --- 4. EKSPOR EXCEL: mode write-only openpyxl (memori konstan untuk hasil besar) ---
+EXPORT_SHEET_NAME = 'Perbandingan_Strategi'
+EXPORT_WIDTH_SAMPLE_ROWS = 500
+
+def estimate_column_widths(df, sample_rows: int = EXPORT_WIDTH_SAMPLE_ROWS) -> list:
+    """
+    Memperkirakan lebar kolom dari sampel baris (tersebar merata) tanpa membuat
+    salinan string untuk seluruh kolom.
+    """
+    if len(df) > sample_rows:
+        sample = df.iloc[np.linspace(0, len(df) - 1, sample_rows).astype(int)]
+    else:
+        sample = df
+    widths = []
+    for column in df.columns:
+        values = sample[column].dropna()
+        longest = max((len(str(v)) for v in values), default=0)
+        widths.append(max(longest, len(str(column))) + 2)
+    return widths
+
+
+def to_excel(df):
+    """
+    Mengkonversi DataFrame menjadi file Excel di dalam memori (bytes).
+    Baris ditulis satu per satu lewat worksheet write-only, sehingga tidak ada objek
+    Cell openpyxl untuk seluruh tabel yang ditahan di memori.
+    """
+    return to_excel_sheets({EXPORT_SHEET_NAME: df})
+
+
+def to_excel_sheets(frames: dict):
+    """
+    Seperti `to_excel`, tetapi satu sheet per DataFrame ({nama_sheet: DataFrame}).
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    thin = Side(style='thin')
+    for sheet_name, df in frames.items():
+        worksheet = workbook.create_sheet(sheet_name[:31])
+        for col_idx, width in enumerate(estimate_column_widths(df), start=1):
+            worksheet.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = width
+
+        # Gaya header disamakan dengan header bawaan pandas.to_excel
+        header_cells = []
+        for column in df.columns:
+            cell = WriteOnlyCell(worksheet, value=str(column))
+            cell.font = Font(bold=True)
+            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            cell.alignment = Alignment(horizontal='center', vertical='top')
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append([None if pd.api.types.is_scalar(value) and pd.isna(value) else value for value in row])
+
+    output = BytesIO()
+    workbook.save(output)
+    # getvalue() mengembalikan buffer internal BytesIO tanpa salinan tambahan.
+    return output.getvalue()
+
+
+# --- 5. RUNNER: SATU WORKBOOK PENUH ---
+def run_workbook_insights(
+    excel_data: bytes,
+    client,
+    insight_cache: InsightCache,
+    scheduler: GeminiCallScheduler,
+    sheet_names: list = None,
+    model_name: str = GEMINI_MODEL_NAME,
+    output_mode: str = OUTPUT_MODE_TEXT,
+    use_caching: bool = True,
+    max_workers: int = BATCH_DEFAULT_CONCURRENCY,
+    on_result=None,
+    trace: RunTrace = None
+) -> dict:
+    """
+    Menjalankan pipeline lengkap untuk satu workbook: parsing sheet, indeks definisi
+    cluster, insight semua cluster (paralel, lewat cache & scheduler), dan tabel
+    perbandingan gabungan. Semua hasil baru tersimpan di `insight_cache`, sehingga
+    permintaan yang sama dari UI menjadi cache hit.
+
+    Returns:
+        (dict): 'results' (hasil per cluster), 'skipped' (cluster tanpa definisi),
+            dan 'comparison' (DataFrame gabungan, siap untuk `to_excel`).
+    """
+    sheets = read_workbook_sheets(excel_data, trace)
+    cluster_index = build_workbook_cluster_index(sheets, trace)
+    program_index = build_workbook_program_index(sheets, sheet_names, trace)
+    return run_index_insights(
+        program_index, cluster_index, client, insight_cache, scheduler,
+        sheet_names=sheet_names,
+        model_name=model_name,
+        output_mode=output_mode,
+        use_caching=use_caching,
+        max_workers=max_workers,
+        on_result=on_result,
+        trace=trace
+    )
+
+
+def run_index_insights(
+    program_index: dict,
+    cluster_index: dict,
+    client,
+    insight_cache: InsightCache,
+    scheduler: GeminiCallScheduler,
+    sheet_names: list = None,
+    model_name: str = GEMINI_MODEL_NAME,
+    output_mode: str = OUTPUT_MODE_TEXT,
+    use_caching: bool = True,
+    max_workers: int = BATCH_DEFAULT_CONCURRENCY,
+    on_result=None,
+    trace: RunTrace = None
+) -> dict:
+    """
+    Seperti `run_workbook_insights`, tetapi dari indeks yang sudah dibangun
+    (mis. dari input CSV).
+
+    Returns:
+        (dict): 'results', 'skipped', dan 'comparison'.
+    """
+    jobs, skipped = collect_cluster_jobs(program_index, cluster_index, sheet_names)
+    results = run_insight_batch(
+        jobs, client, insight_cache, scheduler,
+        model_name=model_name,
+        use_caching=use_caching,
+        max_workers=max_workers,
+        on_result=on_result,
+        output_mode=output_mode,
+        trace=trace
+    )
+    return {
+        'results': results,
+        'skipped': skipped,
+        'comparison': build_batch_comparison_df(results, program_index)
+    }
+
+
+# --- Analisis ulang inkremental: hanya cluster yang berubah sejak revisi terakhir ---
+def build_cluster_fingerprints(jobs: list, program_index: dict, model_name: str, output_mode: str = OUTPUT_MODE_TEXT) -> list:
+    """
+    Fingerprint konten setiap job: definisi, program existing, dan kunci insight (prompt
+    lengkap + model + anggaran token, lihat `insight_cache_key`).
+
+    Returns:
+        (list): Dict 'divisi', 'cluster', 'division_key', 'definition_hash', 'programs_hash',
+            'insight_key' (urutan sama dengan `jobs`).
+    """
+    fingerprints = []
+    for job in jobs:
+        _, existing_data_list = get_existing_programs(program_index[job['divisi']], job['cluster'])
+        fingerprints.append({
+            'divisi': job['divisi'],
+            'cluster': job['cluster'].strip(),
+            'division_key': division_key(job['divisi']),
+            'definition_hash': hash_text(job['cluster_definition']),
+            'programs_hash': programs_fingerprint(existing_data_list),
+            'insight_key': insight_cache_key(job['divisi'], job['cluster'], job['cluster_definition'], model_name, output_mode),
+        })
+    return fingerprints
+
+
+def build_revision_diff_df(diff: list):
+    """
+    Tabel diff revisi (Divisi, Cluster, Perubahan, Insight Baru) untuk ditampilkan di UI.
+    """
+    rows = [
+        {
+            'Divisi': item['divisi'],
+            'Cluster': item['cluster'],
+            'Perubahan': CHANGE_LABELS[item['change']],
+            'Insight Baru': "Ya" if item['change'] in REGENERATE_CHANGES else "Tidak",
+        }
+        for item in diff
+    ]
+    return pd.DataFrame(rows, columns=['Divisi', 'Cluster', 'Perubahan', 'Insight Baru'])
+
+
+def run_incremental_insights(
+    program_index: dict,
+    cluster_index: dict,
+    client,
+    insight_cache: InsightCache,
+    scheduler: GeminiCallScheduler,
+    manifest: InsightManifest,
+    sheet_names: list = None,
+    model_name: str = GEMINI_MODEL_NAME,
+    output_mode: str = OUTPUT_MODE_TEXT,
+    max_workers: int = BATCH_DEFAULT_CONCURRENCY,
+    on_result=None,
+    trace: RunTrace = None
+) -> dict:
+    """
+    Seperti `run_index_insights`, tetapi hanya cluster baru / berubah definisi / berubah
+    prompt atau model yang dikirim ke Gemini (lewat cache & scheduler). Cluster lain memakai
+    insight tersimpan di `manifest` (status 'manifest'); manifest diperbarui untuk setiap
+    hasil yang berhasil, dan entri cluster yang tidak ada lagi dihapus (dilaporkan sekali).
+
+    Returns:
+        (dict): 'results', 'skipped', 'comparison', dan 'diff' (lihat `InsightManifest.diff`).
+    """
+    trace = trace or RunTrace()
+    jobs, skipped = collect_cluster_jobs(program_index, cluster_index, sheet_names)
+    with trace.stage('manifest_diff', clusters=len(jobs)) as event:
+        fingerprints = build_cluster_fingerprints(jobs, program_index, model_name, output_mode)
+        diff = manifest.diff(fingerprints, output_mode)
+        event['regenerate'] = sum(1 for item in diff if item['change'] in REGENERATE_CHANGES)
+        removed = [(item['division_key'], item['cluster']) for item in diff if item['change'] == CHANGE_REMOVED]
+        manifest.remove(removed, output_mode)
+        event['removed'] = len(removed)
+
+    results = [None] * len(jobs)
+    regenerate = []
+    for idx, (job, item) in enumerate(zip(jobs, diff)):
+        if item['change'] in REGENERATE_CHANGES:
+            regenerate.append(idx)
+        else:
+            results[idx] = dict(job, text=item['stored_insight'], status='manifest', error=None)
+            if on_result:
+                on_result(results[idx])
+
+    regenerated = run_insight_batch(
+        [jobs[idx] for idx in regenerate], client, insight_cache, scheduler,
+        model_name=model_name,
+        use_caching=True,
+        max_workers=max_workers,
+        on_result=on_result,
+        output_mode=output_mode,
+        trace=trace
+    )
+    for idx, result in zip(regenerate, regenerated):
+        results[idx] = result
+
+    manifest.update(
+        [dict(fingerprint, insight=result['text']) for fingerprint, result in zip(fingerprints, results) if not result['error']],
+        output_mode,
+        model_name
+    )
+    return {
+        'results': results,
+        'skipped': skipped,
+        'comparison': build_batch_comparison_df(results, program_index),
+        'diff': diff,
+    }
+
+
+# --- 6. MODE MULTI-WORKBOOK: perbandingan lintas file (mis. tahun ini vs tahun lalu) ---
+CROSS_SUMMARY_SHEET_NAME = 'Ringkasan_Cluster'
+CROSS_PROGRAM_SHEET_NAME = 'Detail_Program'
+NO_DESCRIPTION_TEXT = "(tanpa deskripsi)"
+
+
+def build_workbook_index(excel_data: bytes) -> dict:
+    """
+    Parsing satu workbook menjadi indeks ringkas (tanpa DataFrame sheet), aman
+    dijalankan di proses worker.
+
+    Returns:
+        (dict): 'cluster_index' ({divisi: {cluster: definisi}}) dan 'program_index'
+            ({nama_sheet: indeks dari `build_sheet_program_index`}).
+    """
+    sheets = read_workbook_sheets(excel_data)
+    return {
+        'cluster_index': build_workbook_cluster_index(sheets),
+        'program_index': build_workbook_program_index(sheets),
+    }
+
+
+def load_workbook_indexes(workbooks: list, max_workers: int = WORKBOOK_PARSE_PROCESSES, trace: RunTrace = None) -> list:
+    """
+    Mem-parsing banyak workbook secara paralel di process pool (parsing openpyxl terikat
+    CPU dan GIL, sehingga thread tidak membantu). Jika process pool tidak tersedia,
+    parsing dijalankan berurutan.
+
+    Args:
+        workbooks (list): Isi file .xlsx (bytes).
+
+    Returns:
+        (list): Indeks dari `build_workbook_index`, urutan sama dengan `workbooks`.
+    """
+    workers = min(len(workbooks), max_workers or os.cpu_count() or 1)
+    with (trace or RunTrace()).stage('multi_workbook_parse', files=len(workbooks), processes=workers) as event:
+        if workers > 1:
+            try:
+                # "spawn": proses anak tidak mewarisi thread server Streamlit.
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    return list(executor.map(build_workbook_index, workbooks))
+            except (BrokenProcessPool, OSError) as e:
+                event['fallback'] = type(e).__name__
+        event['processes'] = 1
+        return [build_workbook_index(excel_data) for excel_data in workbooks]
+
+
+def workbook_labels(file_names: list) -> list:
+    """
+    Label kolom per workbook: nama file tanpa ekstensi, diberi akhiran jika kembar.
+    """
+    labels = []
+    for name in file_names:
+        label = os.path.splitext(os.path.basename(name))[0] or "Workbook"
+        candidate, suffix = label, 2
+        while candidate in labels:
+            candidate = f"{label} ({suffix})"
+            suffix += 1
+        labels.append(candidate)
+    return labels
+
+
+def merge_workbook_indexes(labels: list, indexes: list) -> dict:
+    """
+    Menyatukan indeks beberapa workbook per (divisi, cluster). Divisi dicocokkan lewat
+    `division_key` dan cluster tanpa membedakan huruf besar/kecil.
+
+    Returns:
+        (dict): {(kunci_divisi, kunci_cluster): {'divisi', 'cluster', 'workbooks'}} dengan
+            'workbooks' = {label: {'definition', 'programs'}} hanya untuk workbook yang memuat cluster tsb.
+    """
+    merged = {}
+    for label, index in zip(labels, indexes):
+        for sheet, sheet_index in index['program_index'].items():
+            definitions = index['cluster_index'].get(division_key(sheet), {})
+            for cluster in sheet_index['clusters']:
+                entry = merged.setdefault(
+                    (division_key(sheet), cluster.lower()),
+                    {'divisi': sheet, 'cluster': cluster, 'workbooks': {}}
+                )
+                entry['workbooks'][label] = {
+                    'definition': definitions.get(cluster),
+                    'programs': get_existing_programs(sheet_index, cluster)[1],
+                }
+    return merged
+
+
+def build_cross_workbook_summary_df(merged: dict, labels: list):
+    """
+    Ringkasan per cluster: jumlah program di setiap workbook, apakah definisi cluster
+    berubah, dan di workbook mana saja cluster tersebut ada.
+    """
+    rows = []
+    for entry in merged.values():
+        present = entry['workbooks']
+        row = {'Divisi': entry['divisi'], 'Cluster': entry['cluster']}
+        for label in labels:
+            row[f"Program [{label}]"] = len(present[label]['programs']) if label in present else None
+        definitions = {(data['definition'] or "").strip() for data in present.values()}
+        row['Definisi Berubah'] = "-" if len(present) < 2 else ("Ya" if len(definitions) > 1 else "Tidak")
+        row['Status'] = "Ada di semua" if len(present) == len(labels) else "Hanya di: " + ", ".join(label for label in labels if label in present)
+        rows.append(row)
+    count_columns = [f"Program [{label}]" for label in labels]
+    columns = ['Divisi', 'Cluster'] + count_columns + ['Definisi Berubah', 'Status']
+    return pd.DataFrame(rows, columns=columns).astype({column: 'Int64' for column in count_columns})
+
+
+def build_cross_workbook_program_df(merged: dict, labels: list):
+    """
+    Detail per program (dicocokkan lewat nama program, tanpa membedakan huruf besar/kecil):
+    deskripsi di setiap workbook (kosong jika program tidak ada di workbook tsb.).
+    """
+    rows = []
+    for entry in merged.values():
+        programs = {}
+        for label in labels:
+            for record in entry['workbooks'].get(label, {}).get('programs', []):
+                name = str(record['program']).strip()
+                row = programs.setdefault(name.lower(), {'Divisi': entry['divisi'], 'Cluster': entry['cluster'], 'Program': name})
+                description = record['deskripsi']
+                has_description = not (pd.api.types.is_scalar(description) and pd.isna(description)) and str(description).strip()
+                row[f"Deskripsi [{label}]"] = str(description).strip() if has_description else NO_DESCRIPTION_TEXT
+        for row in programs.values():
+            found = sum(1 for label in labels if f"Deskripsi [{label}]" in row)
+            row['Ada di'] = f"{found}/{len(labels)}"
+            rows.append(row)
+    columns = ['Divisi', 'Cluster', 'Program'] + [f"Deskripsi [{label}]" for label in labels] + ['Ada di']
+    return pd.DataFrame(rows, columns=columns)
+
+
+def compare_workbooks(file_names: list, workbooks: list, max_workers: int = WORKBOOK_PARSE_PROCESSES, trace: RunTrace = None) -> dict:
+    """
+    Perbandingan lintas workbook: parsing paralel, penyatuan indeks divisi/cluster,
+    lalu tabel ringkasan dan detail program.
+
+    Returns:
+        (dict): 'labels', 'summary' (DataFrame), dan 'programs' (DataFrame).
+    """
+    labels = workbook_labels(file_names)
+    merged = merge_workbook_indexes(labels, load_workbook_indexes(workbooks, max_workers, trace))
+    return {
+        'labels': labels,
+        'summary': build_cross_workbook_summary_df(merged, labels),
+        'programs': build_cross_workbook_program_df(merged, labels),
+    }
+
+
+# --- 7. INPUT CSV: divisi dari sebuah kolom, definisi cluster dari CSV pendamping ---
+# File CSV dibaca per chunk (`CSV_CHUNK_ROWS`) dengan dtype string dan hanya kolom yang
+# dipakai; indeks dibangun bertahap sehingga memori tidak bergantung pada ukuran file.
+CSV_DIVISION_COLUMNS = ['Divisi', 'Division', 'Sheet']
+CSV_PROGRAM_COLUMNS = PROGRAM_INDEX_COLUMNS
+CSV_DEFINITION_COLUMNS = ['Definisi', 'Definition', 'Desc', 'Deskripsi']
+CSV_ENCODING = "utf-8-sig"
+
+
+def read_csv_columns(csv_data: bytes) -> list:
+    """
+    Nama kolom CSV (hanya baris header yang dibaca).
+    """
+    return pd.read_csv(BytesIO(csv_data), nrows=0, encoding=CSV_ENCODING).columns.tolist()
+
+
+def find_csv_column(columns: list, candidates: list):
+    """
+    Kolom pertama di `columns` yang cocok dengan salah satu `candidates` (tidak peka
+    huruf besar/kecil dan spasi), atau None.
+    """
+    normalized = {str(column).strip().lower(): column for column in columns}
+    return next((normalized[name.lower()] for name in candidates if name.lower() in normalized), None)
+
+
+def iter_csv_chunks(csv_data: bytes, columns: list, chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Membaca CSV per chunk: hanya `columns`, semuanya sebagai string (sel kosong = NaN).
+    """
+    return pd.read_csv(
+        BytesIO(csv_data),
+        usecols=columns,
+        dtype={column: str for column in columns},
+        chunksize=chunk_rows,
+        encoding=CSV_ENCODING,
+    )
+
+
+def build_csv_program_index(csv_data: bytes, division_column: str, chunk_rows: int = CSV_CHUNK_ROWS, trace: RunTrace = None) -> dict:
+    """
+    Indeks program existing dari CSV datar: satu baris per program dengan kolom divisi
+    (pengganti sheet), 'Cluster', 'Program Kerja', dan 'Deskripsi'.
+
+    Returns:
+        (dict): {divisi: indeks sheet}, format sama dengan `build_workbook_program_index`.
+    """
+    columns = read_csv_columns(csv_data)
+    missing = [column for column in CSV_PROGRAM_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Kolom CSV tidak ditemukan: {', '.join(missing)}")
+
+    builders = {}
+    with (trace or RunTrace()).stage('csv_program_index', csv_kb=round(len(csv_data) / 1024, 1)) as event:
+        rows = 0
+        for chunk in iter_csv_chunks(csv_data, [division_column] + CSV_PROGRAM_COLUMNS, chunk_rows):
+            rows += len(chunk)
+            divisions = chunk[division_column].str.strip()
+            chunk = chunk[divisions.notna() & divisions.ne('')]
+            for divisi, group in chunk.groupby(divisions, sort=False):
+                builder = builders.get(divisi)
+                if builder is None:
+                    builder = builders[divisi] = SheetProgramIndexBuilder(divisi)
+                builder.add(group)
+        event.update(rows=rows, divisions=len(builders))
+    return {divisi: builder.build() for divisi, builder in builders.items()}
+
+
+def build_csv_cluster_index(csv_data: bytes, division_names: list, chunk_rows: int = CSV_CHUNK_ROWS, trace: RunTrace = None) -> dict:
+    """
+    Indeks definisi cluster dari CSV pendamping. Dua format didukung:
+    - datar: kolom divisi, 'Cluster', dan definisi ('Definisi' / 'Desc' / ...), dibaca per chunk;
+    - blok seperti sheet CLUSTER (diekspor ke CSV tanpa header).
+
+    Returns:
+        (dict): {divisi: {cluster: definisi}}; lookup cukup `index.get(division_key(divisi), {})`.
+    """
+    columns = read_csv_columns(csv_data)
+    division_column = find_csv_column(columns, CSV_DIVISION_COLUMNS)
+    cluster_column = find_csv_column(columns, ['Cluster'])
+    definition_column = find_csv_column(columns, CSV_DEFINITION_COLUMNS)
+
+    with (trace or RunTrace()).stage('cluster_index', source='csv') as event:
+        if division_column and cluster_column and definition_column:
+            cluster_index = {}
+            for chunk in iter_csv_chunks(csv_data, [division_column, cluster_column, definition_column], chunk_rows):
+                chunk = chunk.dropna()
+                for divisi, cluster, definition in zip(chunk[division_column], chunk[cluster_column], chunk[definition_column]):
+                    if cluster.strip() and definition.strip():
+                        cluster_index.setdefault(division_key(divisi), {})[cluster.strip()] = definition.strip()
+        else:
+            division_targets = {v.lower() for v in SHEET_TO_DIVISION_MAP.values()}
+            division_targets.update(division_key(name) for name in division_names)
+            df_cluster_def = pd.read_csv(BytesIO(csv_data), header=None, dtype=str, encoding=CSV_ENCODING)
+            cluster_index = build_cluster_definition_index(df_cluster_def, sorted(division_targets))
+        event['clusters'] = sum(len(definitions) for definitions in cluster_index.values())
+    return cluster_index
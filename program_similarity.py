@@ -0,0 +1,152 @@
+import re
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+
+
+# --- Kemiripan program AI vs program existing (offline, tanpa layanan eksternal) ---
+# Setiap program direpresentasikan sebagai vektor TF-IDF n-gram karakter per kata (3-5
+# karakter, tahan terhadap imbuhan dan salah ketik), lalu semua pasangan dicocokkan lewat
+# cosine similarity dalam satu perkalian matriks NumPy. Skor akhir menggabungkan
+# kemiripan nama program dan kemiripan nama + deskripsi.
+
+DEFAULT_DUPLICATE_THRESHOLD = 0.6
+DEFAULT_NAME_WEIGHT = 0.6
+# Di bawah skor ini tidak ada program existing yang dianggap "terdekat".
+MIN_MATCH_SCORE = 0.1
+NGRAM_RANGE = (3, 5)
+WORD_NGRAM_CACHE_SIZE = 50_000
+
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+
+def normalize_text(text) -> str:
+    """
+    Huruf kecil, tanda baca dibuang, spasi dirapatkan. None/NaN menjadi string kosong.
+    """
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return ""
+    return " ".join(NON_WORD_PATTERN.sub(" ", str(text).lower()).split())
+
+
+@lru_cache(maxsize=WORD_NGRAM_CACHE_SIZE)
+def word_ngrams(word: str, ngram_range: tuple = NGRAM_RANGE) -> tuple:
+    """
+    N-gram karakter satu kata yang diberi batas spasi (awalan/akhiran kata ikut
+    terwakili, setara analyzer 'char_wb'); kata yang lebih pendek dari n dipakai utuh.
+    """
+    low, high = ngram_range
+    padded = f" {word} "
+    ngrams = []
+    for n in range(low, high + 1):
+        if len(padded) <= n:
+            ngrams.append(padded)
+            break
+        ngrams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return tuple(ngrams)
+
+
+def cosine_similarity_matrix(query_texts: list, reference_texts: list) -> np.ndarray:
+    """
+    Cosine similarity TF-IDF n-gram karakter antara setiap teks query dan teks referensi.
+
+    Bobot: tf sublinear (1 + log tf) x idf halus, dinormalisasi L2 per dokumen. Hanya
+    n-gram yang muncul di query yang bisa menyumbang ke dot product, sehingga matriks
+    padat cukup selebar kosakata query (bukan seluruh kosakata referensi).
+
+    Returns:
+        (np.ndarray): Matriks float32 (len(query_texts), len(reference_texts)) bernilai 0..1.
+    """
+    n_query, n_reference = len(query_texts), len(reference_texts)
+    if not n_query or not n_reference:
+        return np.zeros((n_query, n_reference), dtype=np.float32)
+
+    # Id n-gram diselesaikan sekali per kata unik, bukan per kemunculan n-gram.
+    vocabulary = {}
+    word_terms = {}
+    doc_terms = []
+    for text in list(query_texts) + list(reference_texts):
+        terms = []
+        for word in normalize_text(text).split():
+            word_ids = word_terms.get(word)
+            if word_ids is None:
+                word_ids = word_terms[word] = [vocabulary.setdefault(gram, len(vocabulary)) for gram in word_ngrams(word)]
+            terms += word_ids
+        doc_terms.append(terms)
+    n_docs = n_query + n_reference
+    n_terms = len(vocabulary)
+    if not n_terms:
+        return np.zeros((n_query, n_reference), dtype=np.float32)
+
+    lengths = [len(terms) for terms in doc_terms]
+    term_ids = np.fromiter(chain.from_iterable(doc_terms), dtype=np.int64, count=sum(lengths))
+    doc_ids = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+    pairs, counts = np.unique(doc_ids * n_terms + term_ids, return_counts=True)
+    docs, terms = np.divmod(pairs, n_terms)
+
+    idf = np.log((1 + n_docs) / (1 + np.bincount(terms, minlength=n_terms))) + 1
+    weights = (1 + np.log(counts)) * idf[terms]
+    norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=n_docs))
+    weights /= norms[docs]
+
+    query_terms = np.unique(terms[docs < n_query])
+    columns = np.full(n_terms, -1, dtype=np.int64)
+    columns[query_terms] = np.arange(len(query_terms))
+    keep = columns[terms] >= 0
+    dense = np.zeros((n_docs, len(query_terms)), dtype=np.float32)
+    dense[docs[keep], columns[terms[keep]]] = weights[keep]
+    return np.clip(dense[:n_query] @ dense[n_query:].T, 0.0, 1.0)
+
+
+def program_text(item: dict) -> str:
+    return f"{normalize_text(item.get('program'))} {normalize_text(item.get('deskripsi'))}".strip()
+
+
+def no_match(score: float) -> dict:
+    return {'match_index': None, 'match_program': None, 'score': score, 'duplicate': False}
+
+
+def match_programs(
+    existing_data_list: list,
+    ai_data_list: list,
+    threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+    name_weight: float = DEFAULT_NAME_WEIGHT,
+) -> list:
+    """
+    Mencocokkan setiap program AI dengan program existing yang paling mirip.
+
+    Returns:
+        (list): Satu dict per program AI (urutan sama dengan `ai_data_list`): 'match_index'
+            (indeks di `existing_data_list`, atau None jika skor < MIN_MATCH_SCORE),
+            'match_program', 'score' (0..1), dan 'duplicate' (True jika score >= threshold).
+    """
+    if not existing_data_list:
+        return [no_match(0.0) for _ in ai_data_list]
+    if not ai_data_list:
+        return []
+
+    name_scores = cosine_similarity_matrix(
+        [item.get('program') for item in ai_data_list],
+        [item.get('program') for item in existing_data_list],
+    )
+    full_scores = cosine_similarity_matrix(
+        [program_text(item) for item in ai_data_list],
+        [program_text(item) for item in existing_data_list],
+    )
+    scores = name_weight * name_scores + (1 - name_weight) * full_scores
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(best)), best]
+
+    matches = []
+    for match_index, score in zip(best.tolist(), best_scores.tolist()):
+        if score < MIN_MATCH_SCORE:
+            matches.append(no_match(round(score, 3)))
+            continue
+        matches.append({
+            'match_index': match_index,
+            'match_program': existing_data_list[match_index]['program'],
+            'score': round(score, 3),
+            'duplicate': score >= threshold,
+        })
+    return matches
@@ -0,0 +1,232 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from google.genai import types
+
+from gemini_scheduler import estimate_tokens
+
+
+# --- Anggaran token prompt & context caching Gemini ---
+# Definisi cluster yang terlalu panjang dipadatkan (spasi/kalimat duplikat) lalu dipotong
+# di batas kalimat hingga muat dalam anggaran token (diukur dengan `count_tokens` SDK).
+# Blok instruksi statis disimpan sebagai cached content Gemini jika ukurannya memenuhi
+# minimum token model, sehingga tidak ditagih penuh di setiap panggilan.
+
+DEFAULT_DEFINITION_TOKEN_BUDGET = 300
+DEFAULT_CONTEXT_CACHE_TTL_SECONDS = 60 * 60
+DEFAULT_TOKEN_COUNT_CACHE_SIZE = 4096
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 120
+CONTEXT_CACHE_RETRY_SECONDS = 10 * 60
+
+# Minimum token cached content per model (dokumentasi Gemini); model lain memakai default.
+MIN_CONTEXT_CACHE_TOKENS = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-flash-lite": 1024,
+    "gemini-2.5-pro": 4096,
+}
+DEFAULT_MIN_CONTEXT_CACHE_TOKENS = 4096
+
+TRUNCATION_MARKER = " …"
+
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?;])\s+")
+
+
+def compact_text(text: str) -> str:
+    """
+    Memadatkan teks tanpa membuang isi: spasi/baris kosong berlebih dirapatkan dan
+    kalimat yang berulang persis hanya disimpan sekali.
+    """
+    sentences = SENTENCE_END_PATTERN.split(" ".join((text or "").split()))
+    seen = set()
+    kept = []
+    for sentence in sentences:
+        key = sentence.lower()
+        if sentence and key not in seen:
+            seen.add(key)
+            kept.append(sentence)
+    return " ".join(kept)
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """
+    Memotong teks ke maksimal `max_chars` karakter di batas kalimat (atau kata jika
+    kalimat pertama sudah terlalu panjang), lalu menambahkan penanda `…`.
+    """
+    if len(text) <= max_chars:
+        return text
+    limit = max(0, max_chars - len(TRUNCATION_MARKER))
+    head = text[:limit]
+    sentence_cut = max(head.rfind(". "), head.rfind("; "), head.rfind("! "), head.rfind("? "))
+    if sentence_cut >= limit // 2:
+        head = head[:sentence_cut + 1]
+    elif " " in head:
+        head = head[:head.rfind(" ")]
+    return head.rstrip() + TRUNCATION_MARKER
+
+
+class PromptBudget:
+    """
+    Pengukur & penegak anggaran token prompt untuk seluruh proses (thread-safe).
+
+    - `count_tokens()` memakai `client.models.count_tokens` dengan memo per (model, teks);
+      jika SDK gagal, jatuh ke perkiraan ~4 karakter per token.
+    - `fit_definition()` memadatkan / memotong definisi cluster hingga <= anggaran.
+    - `context_cache()` mengembalikan nama cached content untuk blok instruksi statis
+      (dibuat sekali per model + isi instruksi, diperbarui sebelum TTL habis), atau
+      None jika model/ukuran tidak memenuhi syarat.
+    """
+
+    def __init__(
+        self,
+        definition_token_budget: int = DEFAULT_DEFINITION_TOKEN_BUDGET,
+        context_cache_ttl_seconds: int = DEFAULT_CONTEXT_CACHE_TTL_SECONDS,
+        enable_context_cache: bool = True,
+        min_context_cache_tokens: int = None,
+        token_count_cache_size: int = DEFAULT_TOKEN_COUNT_CACHE_SIZE,
+    ):
+        self.definition_token_budget = definition_token_budget
+        self.context_cache_ttl_seconds = context_cache_ttl_seconds
+        self.enable_context_cache = enable_context_cache
+        self.min_context_cache_tokens = min_context_cache_tokens
+        self.token_count_cache_size = token_count_cache_size
+        self._token_counts = OrderedDict()
+        self._context_caches = {}
+        self._lock = threading.Lock()
+        self._cache_create_lock = threading.Lock()
+
+        self.counted = 0
+        self.compacted = 0
+        self.truncated = 0
+
+    def count_tokens(self, client, model_name: str, text: str) -> int:
+        """
+        Jumlah token `text` menurut tokenizer model (dengan memo LRU per proses).
+        """
+        memo_key = (model_name, hashlib.sha256((text or "").encode("utf-8")).hexdigest())
+        with self._lock:
+            if memo_key in self._token_counts:
+                self._token_counts.move_to_end(memo_key)
+                return self._token_counts[memo_key]
+        try:
+            tokens = int(client.models.count_tokens(model=model_name, contents=text).total_tokens)
+        except Exception:
+            # Tanpa koneksi / model tidak mendukung count_tokens: cukup perkiraan kasar.
+            return estimate_tokens(text)
+        with self._lock:
+            self.counted += 1
+            self._token_counts[memo_key] = tokens
+            while len(self._token_counts) > self.token_count_cache_size:
+                self._token_counts.popitem(last=False)
+        return tokens
+
+    def fit_definition(self, client, model_name: str, definition: str):
+        """
+        Menyesuaikan definisi cluster dengan anggaran token.
+
+        Returns:
+            (tuple): (definisi_final, info). `info` berisi 'definition_tokens',
+                'definition_compacted', dan 'definition_truncated'.
+        """
+        budget = self.definition_token_budget
+        text = definition or ""
+        info = {"definition_compacted": False, "definition_truncated": False}
+        # Definisi yang jelas jauh di bawah anggaran tidak perlu diukur lewat API.
+        if not budget or estimate_tokens(text) * 2 <= budget:
+            info["definition_tokens"] = estimate_tokens(text)
+            return text, info
+
+        tokens = self.count_tokens(client, model_name, text)
+        if tokens > budget:
+            compacted = compact_text(text)
+            if compacted != text:
+                text = compacted
+                tokens = self.count_tokens(client, model_name, text)
+                info["definition_compacted"] = True
+        attempts = 0
+        while tokens > budget and attempts < 4:
+            # Potong proporsional terhadap rasio anggaran, lalu ukur ulang.
+            max_chars = int(len(text) * budget / tokens * 0.95)
+            text = truncate_text(text, max_chars)
+            tokens = self.count_tokens(client, model_name, text)
+            info["definition_truncated"] = True
+            attempts += 1
+
+        with self._lock:
+            self.compacted += 1 if info["definition_compacted"] else 0
+            self.truncated += 1 if info["definition_truncated"] else 0
+        info["definition_tokens"] = tokens
+        return text, info
+
+    def min_cache_tokens(self, model_name: str) -> int:
+        if self.min_context_cache_tokens:
+            return self.min_context_cache_tokens
+        return MIN_CONTEXT_CACHE_TOKENS.get(model_name, DEFAULT_MIN_CONTEXT_CACHE_TOKENS)
+
+    def context_cache(self, client, model_name: str, system_instruction: str):
+        """
+        Nama cached content Gemini untuk `system_instruction` (atau None jika caching
+        tidak aktif, instruksi di bawah minimum token model, atau pembuatan gagal).
+        """
+        if not self.enable_context_cache or not hasattr(client, "caches"):
+            return None
+        cache_id = (model_name, hashlib.sha256(system_instruction.encode("utf-8")).hexdigest())
+        now = time.time()
+        with self._lock:
+            entry = self._context_caches.get(cache_id)
+        if entry and entry["expires_at"] - CONTEXT_CACHE_REFRESH_MARGIN_SECONDS > now:
+            return entry["name"]
+
+        with self._cache_create_lock:
+            with self._lock:
+                entry = self._context_caches.get(cache_id)
+            if entry and entry["expires_at"] - CONTEXT_CACHE_REFRESH_MARGIN_SECONDS > now:
+                return entry["name"]
+
+            name = None
+            expires_at = now + CONTEXT_CACHE_RETRY_SECONDS
+            if self.count_tokens(client, model_name, system_instruction) >= self.min_cache_tokens(model_name):
+                try:
+                    cached = client.caches.create(
+                        model=model_name,
+                        config=types.CreateCachedContentConfig(
+                            system_instruction=system_instruction,
+                            display_name="insight-system-prompt",
+                            ttl=f"{int(self.context_cache_ttl_seconds)}s",
+                        ),
+                    )
+                    name = cached.name
+                    expires_at = now + self.context_cache_ttl_seconds
+                except Exception:
+                    name = None
+            else:
+                # Instruksi terlalu pendek untuk model ini: jangan cek ulang sampai TTL.
+                expires_at = now + self.context_cache_ttl_seconds
+            with self._lock:
+                self._context_caches[cache_id] = {"name": name, "expires_at": expires_at}
+            return name
+
+    def invalidate_context_cache(self, name: str):
+        """
+        Melupakan cached content yang ditolak API (mis. sudah kedaluwarsa / dihapus).
+        """
+        with self._lock:
+            for cache_id, entry in list(self._context_caches.items()):
+                if entry["name"] == name:
+                    del self._context_caches[cache_id]
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            (dict): Jumlah pengukuran token via API, definisi yang dipadatkan/dipotong,
+                dan cached content aktif.
+        """
+        with self._lock:
+            return {
+                "counted": self.counted,
+                "compacted": self.compacted,
+                "truncated": self.truncated,
+                "context_caches": sum(1 for entry in self._context_caches.values() if entry["name"]),
+            }